@@ -2,94 +2,175 @@
 
 from __future__ import annotations
 
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 from probe.chunking.text import chunk_lines, chunk_markdown
-from probe.chunking.tree_sitter import SUPPORTED_LANGUAGES, chunk_with_tree_sitter
+from probe.chunking.tree_sitter import SUPPORTED_LANGUAGES, TreeCache, chunk_with_tree_sitter
 from probe.types import Chunk, ChunkKind
 
+# Bump when chunk_file output changes for the same input (invalidates caches)
+CHUNKER_VERSION = 6
+
+# Below this size (in UTF-8 bytes) a file is one chunk anyway; skip the
+# tree-sitter parse. Such files get no per-symbol chunks or symbol names.
+TREE_SITTER_MIN_BYTES = 2048
+
+# File extension -> tree-sitter language name
+LANGUAGE_BY_SUFFIX: dict[str, str] = {
+    ".py": "python",
+    ".js": "javascript",
+    ".ts": "typescript",
+    ".tsx": "tsx",
+    ".jsx": "jsx",
+    ".rs": "rust",
+    ".go": "go",
+    ".java": "java",
+    ".c": "c",
+    ".cpp": "cpp",
+    ".h": "c",
+    ".hpp": "cpp",
+    ".cs": "c_sharp",
+    ".rb": "ruby",
+    ".php": "php",
+    ".swift": "swift",
+    ".kt": "kotlin",
+    ".scala": "scala",
+    ".lua": "lua",
+    ".sh": "bash",
+    ".bash": "bash",
+    ".zsh": "bash",
+    ".r": "r",
+    ".sql": "sql",
+    ".html": "html",
+    ".css": "css",
+    ".scss": "scss",
+    ".vue": "vue",
+    ".svelte": "svelte",
+    ".zig": "zig",
+    ".nim": "nim",
+    ".ex": "elixir",
+    ".exs": "elixir",
+    ".erl": "erlang",
+    ".hs": "haskell",
+    ".ml": "ocaml",
+    ".clj": "clojure",
+    ".lisp": "commonlisp",
+    ".el": "elisp",
+}
+
+# Chunk kind by file extension, then by exact file name; anything else is code
+KIND_BY_SUFFIX: dict[str, ChunkKind] = {
+    **dict.fromkeys((".md", ".rst", ".txt", ".adoc"), ChunkKind.DOC),
+    **dict.fromkeys(
+        (".json", ".yaml", ".yml", ".toml", ".ini", ".cfg", ".conf"), ChunkKind.CONFIG
+    ),
+}
+KIND_BY_NAME: dict[str, ChunkKind] = dict.fromkeys(
+    ("dockerfile", "makefile", ".gitignore", ".env.example"), ChunkKind.CONFIG
+)
+
+
+def _classify(path: Path) -> tuple[str, str | None, ChunkKind]:
+    """Get (lowercased suffix, language, kind) for a path in one pass."""
+    suffix = path.suffix.lower()
+    kind = KIND_BY_SUFFIX.get(suffix) or KIND_BY_NAME.get(path.name.lower(), ChunkKind.CODE)
+    return suffix, LANGUAGE_BY_SUFFIX.get(suffix), kind
+
 
 def detect_language(path: Path) -> str | None:
     """Detect language from file extension."""
-    ext_map = {
-        ".py": "python",
-        ".js": "javascript",
-        ".ts": "typescript",
-        ".tsx": "tsx",
-        ".jsx": "jsx",
-        ".rs": "rust",
-        ".go": "go",
-        ".java": "java",
-        ".c": "c",
-        ".cpp": "cpp",
-        ".h": "c",
-        ".hpp": "cpp",
-        ".cs": "c_sharp",
-        ".rb": "ruby",
-        ".php": "php",
-        ".swift": "swift",
-        ".kt": "kotlin",
-        ".scala": "scala",
-        ".lua": "lua",
-        ".sh": "bash",
-        ".bash": "bash",
-        ".zsh": "bash",
-        ".r": "r",
-        ".sql": "sql",
-        ".html": "html",
-        ".css": "css",
-        ".scss": "scss",
-        ".vue": "vue",
-        ".svelte": "svelte",
-        ".zig": "zig",
-        ".nim": "nim",
-        ".ex": "elixir",
-        ".exs": "elixir",
-        ".erl": "erlang",
-        ".hs": "haskell",
-        ".ml": "ocaml",
-        ".clj": "clojure",
-        ".lisp": "commonlisp",
-        ".el": "elisp",
-    }
-    return ext_map.get(path.suffix.lower())
+    return LANGUAGE_BY_SUFFIX.get(path.suffix.lower())
 
 
 def detect_kind(path: Path) -> ChunkKind:
     """Detect chunk kind from file path."""
-    name = path.name.lower()
-    suffix = path.suffix.lower()
-
-    # Documentation
-    if suffix in {".md", ".rst", ".txt", ".adoc"}:
-        return ChunkKind.DOC
-
-    # Config files
-    if suffix in {".json", ".yaml", ".yml", ".toml", ".ini", ".cfg", ".conf"}:
-        return ChunkKind.CONFIG
-    if name in {"dockerfile", "makefile", ".gitignore", ".env.example"}:
-        return ChunkKind.CONFIG
-
-    return ChunkKind.CODE
-
-
-def chunk_file(content: str, path: Path) -> list[Chunk]:
-    """Chunk a file using the appropriate strategy."""
-    language = detect_language(path)
-    kind = detect_kind(path)
-
-    # Try tree-sitter for supported languages
-    if language and language in SUPPORTED_LANGUAGES:
-        chunks = chunk_with_tree_sitter(content, path, language)
+    return _classify(path)[2]
+
+
+def decode_source(data: bytes) -> tuple[str, bytes]:
+    """Decode raw file bytes into (text, source) for chunking.
+
+    Newlines are normalized like `Path.read_text()` does so line numbers agree
+    with snippet generation. `source` is the UTF-8 encoding of `text`, which is
+    `data` itself for the common LF-only file. Raises UnicodeDecodeError for
+    non-UTF-8 (binary) content.
+    """
+    text = data.decode("utf-8")
+    if "\r" not in text:
+        return text, data
+
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text, text.encode()
+
+
+def chunk_file(
+    content: str | bytes, path: Path, tree_cache: TreeCache | None = None
+) -> list[Chunk]:
+    """Chunk a file using the appropriate strategy.
+
+    Accepts raw file bytes so tree-sitter can parse them without a re-encode.
+    A `tree_cache` enables incremental reparsing of previously seen files.
+    """
+    if isinstance(content, bytes):
+        content, source = decode_source(content)
+    else:
+        source = None
+
+    suffix, language, kind = _classify(path)
+
+    # Try tree-sitter for supported languages (small files are one chunk anyway).
+    # A str has at least as many UTF-8 bytes as characters, so it's only
+    # encoded to measure it when it's short.
+    if source is not None:
+        large = len(source) >= TREE_SITTER_MIN_BYTES
+    else:
+        large = (
+            len(content) >= TREE_SITTER_MIN_BYTES
+            or len(content.encode()) >= TREE_SITTER_MIN_BYTES
+        )
+    if language and language in SUPPORTED_LANGUAGES and large:
+        chunks = chunk_with_tree_sitter(
+            content, path, language, source=source, tree_cache=tree_cache
+        )
         if chunks:
             return chunks
 
     # Markdown gets heading-based chunking
-    if kind == ChunkKind.DOC and path.suffix.lower() == ".md":
+    if kind == ChunkKind.DOC and suffix == ".md":
         return chunk_markdown(content, path)
 
     # Fallback to line-based chunking
-    return chunk_lines(content, path, kind=kind)
-
-
-__all__ = ["chunk_file", "detect_language", "detect_kind", "SUPPORTED_LANGUAGES"]
+    return chunk_lines(content, path, kind=kind, language=language)
+
+
+def create_chunk_executor(max_workers: int | None = None) -> ProcessPoolExecutor:
+    """Create a process pool for running `chunk_file` off the event loop.
+
+    Chunking is CPU-bound Python, so a process pool is what scales it across
+    cores. Workers are not plain-forked since the caller usually has live
+    threads (aiosqlite, httpx) that must not be duplicated; where available a
+    forkserver with this module preloaded keeps worker startup cheap.
+    """
+    context: multiprocessing.context.BaseContext
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["probe.chunking"])
+    else:
+        context = multiprocessing.get_context("spawn")
+
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+
+__all__ = [
+    "CHUNKER_VERSION",
+    "chunk_file",
+    "create_chunk_executor",
+    "decode_source",
+    "detect_language",
+    "detect_kind",
+    "SUPPORTED_LANGUAGES",
+    "TREE_SITTER_MIN_BYTES",
+    "TreeCache",
+]
@@ -0,0 +1,98 @@
+"""Line offset index for slicing line ranges out of file content."""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_right
+from collections.abc import Iterator
+from itertools import accumulate
+
+# Line boundaries recognized by str.splitlines() other than "\n"
+_OTHER_LINE_BREAKS = re.compile("[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
+class LineIndex:
+    """Line offsets for a text, matching `str.splitlines()` semantics.
+
+    Slicing a range of lines is a single string slice instead of
+    `"\\n".join(lines[i:j])`, which copies every line once per chunk. Results
+    are identical to the join for any input. The offset table is only built on
+    the first slice, so counting lines is cheap.
+    """
+
+    __slots__ = ("text", "count", "_starts", "_uniform", "_lines")
+
+    def __init__(self, text: str):
+        self.text = text
+        # Slicing only equals the join when every line break is a bare "\n"
+        self._uniform = _OTHER_LINE_BREAKS.search(text) is None
+        self._starts: list[int] | None = None
+        self._lines: list[str] | None = None
+        if self._uniform:
+            self.count = text.count("\n") + (0 if not text or text.endswith("\n") else 1)
+        else:
+            self._lines = text.splitlines()
+            self.count = len(self._lines)
+
+    def _line_starts(self) -> list[int]:
+        if self._starts is None:
+            keep = self.text.splitlines(keepends=True)
+            self._starts = [0, *accumulate(map(len, keep))]
+        return self._starts
+
+    def slice(self, start: int, end: int) -> str:
+        """Return lines [start, end) (0-indexed) joined with newlines."""
+        start = max(0, start)
+        end = min(self.count, end)
+        if start >= end:
+            return ""
+
+        if not self._uniform:
+            assert self._lines is not None
+            return "\n".join(self._lines[start:end])
+
+        starts = self._line_starts()
+        text = self.text[starts[start] : starts[end]]
+        return text[:-1] if text.endswith("\n") else text
+
+    def lines_starting_with(self, prefix: str) -> Iterator[int]:
+        """Yield 0-indexed lines that start with `prefix`.
+
+        Matches are found with `str.find` over the whole text, so Python only
+        runs per matching line rather than per line.
+        """
+        if not self._uniform:
+            assert self._lines is not None
+            yield from (i for i, line in enumerate(self._lines) if line.startswith(prefix))
+            return
+
+        text = self.text
+        if text.startswith(prefix):
+            yield 0
+
+        needle = "\n" + prefix
+        line = 0
+        pos = 0  # offset where `line` starts
+        while (hit := text.find(needle, pos)) != -1:
+            line += text.count("\n", pos, hit) + 1
+            pos = hit + 1
+            yield line
+
+    def line_of(self, offset: int) -> int:
+        """Return the 0-indexed line containing a character offset."""
+        return bisect_right(self._line_starts(), offset) - 1
+
+
+def window_starts(line_count: int, size: int, overlap: int) -> range:
+    """0-indexed start lines of overlapping `size`-line windows covering a file.
+
+    The last window ends exactly at `line_count`; the number of windows is
+    known up front, so callers can build chunk lists in one comprehension.
+    """
+    if line_count <= 0:
+        return range(0)
+    step = max(1, size - overlap)
+    return range(0, max(line_count - size, 0) + step, step)
+
+
+__all__ = ["LineIndex", "window_starts"]
@@ -5,6 +5,7 @@ from __future__ import annotations
 import re
 from pathlib import Path
 
+from probe.chunking.lines import LineIndex, window_starts
 from probe.types import Chunk, ChunkKind
 
 # Chunk size settings
@@ -12,26 +13,29 @@ DEFAULT_CHUNK_LINES = 150
 DEFAULT_OVERLAP_LINES = 30
 MIN_CHUNK_LINES = 10
 
+# ATX heading: 1-6 '#' followed by whitespace and the title
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.+)$")
+
 
 def chunk_markdown(content: str, path: Path) -> list[Chunk]:
     """Chunk markdown by headings."""
-    lines = content.splitlines()
-    if not lines:
+    index = LineIndex(content)
+    line_count = index.count
+    if not line_count:
         return []
 
     chunks: list[Chunk] = []
-    heading_pattern = re.compile(r"^(#{1,6})\s+(.+)$")
 
     current_start = 0
     current_heading = "(intro)"
 
-    for i, line in enumerate(lines):
-        match = heading_pattern.match(line)
+    # Only lines starting with '#' can be headings; find them without a per-line loop
+    for i in index.lines_starting_with("#"):
+        match = HEADING_PATTERN.match(index.slice(i, i + 1))
         if match:
             # Save previous section if it has content
             if i > current_start:
-                section_lines = lines[current_start:i]
-                section_content = "\n".join(section_lines)
+                section_content = index.slice(current_start, i)
                 if section_content.strip():
                     chunks.append(
                         Chunk(
@@ -49,15 +53,14 @@ def chunk_markdown(content: str, path: Path) -> list[Chunk]:
             current_heading = match.group(2).strip()
 
     # Don't forget the last section
-    if current_start < len(lines):
-        section_lines = lines[current_start:]
-        section_content = "\n".join(section_lines)
+    if current_start < line_count:
+        section_content = index.slice(current_start, line_count)
         if section_content.strip():
             chunks.append(
                 Chunk(
                     file_path=path,
                     start_line=current_start + 1,
-                    end_line=len(lines),
+                    end_line=line_count,
                     content=section_content,
                     language="markdown",
                     kind=ChunkKind.DOC,
@@ -71,7 +74,7 @@ def chunk_markdown(content: str, path: Path) -> list[Chunk]:
             Chunk(
                 file_path=path,
                 start_line=1,
-                end_line=len(lines),
+                end_line=line_count,
                 content=content,
                 language="markdown",
                 kind=ChunkKind.DOC,
@@ -88,53 +91,41 @@ def chunk_lines(
     chunk_size: int = DEFAULT_CHUNK_LINES,
     overlap: int = DEFAULT_OVERLAP_LINES,
     kind: ChunkKind = ChunkKind.CODE,
+    language: str | None = None,
 ) -> list[Chunk]:
     """Fallback line-based chunking with overlap."""
-    lines = content.splitlines()
-    if not lines:
+    index = LineIndex(content)
+    line_count = index.count
+    if not line_count:
         return []
 
-    # For small files, return as single chunk
-    if len(lines) <= chunk_size:
+    # For small files, return as single chunk (sliced like the windows below,
+    # so the trailing newline is dropped and the hash matches the snippet's)
+    if line_count <= chunk_size:
         return [
             Chunk(
                 file_path=path,
                 start_line=1,
-                end_line=len(lines),
-                content=content,
-                language=None,
+                end_line=line_count,
+                content=index.slice(0, line_count),
+                language=language,
                 kind=kind,
                 symbol=None,
             )
         ]
 
-    chunks: list[Chunk] = []
-    i = 0
-
-    while i < len(lines):
-        end = min(i + chunk_size, len(lines))
-        chunk_lines_slice = lines[i:end]
-        chunk_content = "\n".join(chunk_lines_slice)
-
-        chunks.append(
-            Chunk(
-                file_path=path,
-                start_line=i + 1,
-                end_line=end,
-                content=chunk_content,
-                language=None,
-                kind=kind,
-                symbol=None,
-            )
+    return [
+        Chunk(
+            file_path=path,
+            start_line=i + 1,
+            end_line=min(i + chunk_size, line_count),
+            content=index.slice(i, i + chunk_size),
+            language=language,
+            kind=kind,
+            symbol=None,
         )
-
-        if end >= len(lines):
-            break
-
-        # Move forward, keeping overlap
-        i = end - overlap
-
-    return chunks
+        for i in window_starts(line_count, chunk_size, overlap)
+    ]
 
 
 __all__ = ["chunk_markdown", "chunk_lines"]
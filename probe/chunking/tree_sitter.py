@@ -2,8 +2,14 @@
 
 from __future__ import annotations
 
+from collections import OrderedDict
+from functools import cache
 from pathlib import Path
+from typing import Any
 
+from tree_sitter import Node, QueryCursor
+
+from probe.chunking.lines import LineIndex, window_starts
 from probe.types import Chunk, ChunkKind
 
 # Languages supported by tree-sitter-language-pack
@@ -46,56 +52,266 @@ SUPPORTED_LANGUAGES = {
 }
 
 # Node types that represent semantic units (functions, classes, etc.)
-SEMANTIC_NODES: dict[str, set[str]] = {
-    "python": {"function_definition", "class_definition", "decorated_definition"},
-    "javascript": {
+SEMANTIC_NODES: dict[str, frozenset[str]] = {
+    "python": frozenset({"function_definition", "class_definition", "decorated_definition"}),
+    "javascript": frozenset({
         "function_declaration", "class_declaration", "arrow_function", "method_definition"
-    },
-    "typescript": {
+    }),
+    "typescript": frozenset({
         "function_declaration", "class_declaration", "arrow_function", "method_definition"
-    },
-    "tsx": {
+    }),
+    "tsx": frozenset({
         "function_declaration", "class_declaration", "arrow_function", "method_definition"
-    },
-    "rust": {"function_item", "impl_item", "struct_item", "enum_item", "trait_item"},
-    "go": {"function_declaration", "method_declaration", "type_declaration"},
-    "java": {"method_declaration", "class_declaration", "interface_declaration"},
-    "c": {"function_definition", "struct_specifier"},
-    "cpp": {"function_definition", "class_specifier", "struct_specifier"},
+    }),
+    "rust": frozenset({"function_item", "impl_item", "struct_item", "enum_item", "trait_item"}),
+    "go": frozenset({"function_declaration", "method_declaration", "type_declaration"}),
+    "java": frozenset({"method_declaration", "class_declaration", "interface_declaration"}),
+    "c": frozenset({"function_definition", "struct_specifier"}),
+    "cpp": frozenset({"function_definition", "class_specifier", "struct_specifier"}),
+}
+
+# Queries locating each semantic unit's name, captured as @unit and @name
+_JS_NAME_QUERY = """
+(function_declaration name: (_) @name) @unit
+(class_declaration name: (_) @name) @unit
+(method_definition name: (_) @name) @unit
+(variable_declarator name: (identifier) @name value: (arrow_function) @unit)
+"""
+
+NAME_QUERIES: dict[str, str] = {
+    "python": """
+(function_definition name: (identifier) @name) @unit
+(class_definition name: (identifier) @name) @unit
+(decorated_definition definition: (_ name: (identifier) @name)) @unit
+""",
+    "javascript": _JS_NAME_QUERY,
+    "typescript": _JS_NAME_QUERY,
+    "tsx": _JS_NAME_QUERY,
+    "rust": """
+(function_item name: (_) @name) @unit
+(struct_item name: (_) @name) @unit
+(enum_item name: (_) @name) @unit
+(trait_item name: (_) @name) @unit
+(impl_item type: (_) @name) @unit
+""",
+    "go": """
+(function_declaration name: (_) @name) @unit
+(method_declaration name: (_) @name) @unit
+(type_declaration (type_spec name: (_) @name)) @unit
+""",
+    "java": """
+(method_declaration name: (_) @name) @unit
+(class_declaration name: (_) @name) @unit
+(interface_declaration name: (_) @name) @unit
+""",
+    "c": """
+(function_definition declarator: (function_declarator declarator: (_) @name)) @unit
+(struct_specifier name: (_) @name) @unit
+""",
+    "cpp": """
+(function_definition declarator: (function_declarator declarator: (_) @name)) @unit
+(class_specifier name: (_) @name) @unit
+(struct_specifier name: (_) @name) @unit
+""",
 }
 
 # Min/max lines for chunks
 MIN_CHUNK_LINES = 20
 MAX_CHUNK_LINES = 250
 
+# Files whose last parse tree is kept for incremental reparsing
+TREE_CACHE_MAX_ENTRIES = 512
+
+
+@cache
+def _get_parser(language: str) -> Any | None:
+    """Get a tree-sitter parser for a language, built once per process.
 
-def chunk_with_tree_sitter(content: str, path: Path, language: str) -> list[Chunk]:
-    """Chunk code using tree-sitter AST parsing."""
+    Returns None if tree-sitter-language-pack is missing or the language is
+    unsupported; the failure is cached too so we don't retry on every file.
+    """
     try:
         from tree_sitter_language_pack import get_parser
     except ImportError:
         # tree-sitter-language-pack not installed
-        return []
+        return None
 
     try:
-        parser = get_parser(language)
+        return get_parser(language)
     except Exception:
         # Language not supported
+        return None
+
+
+def _kind_ids(ts_language: Any, names: frozenset[str]) -> frozenset[int]:
+    """Map node type names to numeric kind ids, including aliased symbols."""
+    return frozenset(
+        kind_id
+        for kind_id in range(ts_language.node_kind_count)
+        if ts_language.node_kind_is_named(kind_id)
+        and ts_language.node_kind_for_id(kind_id) in names
+    )
+
+
+@cache
+def _semantic_kind_ids(language: str) -> frozenset[int]:
+    """Kind ids of SEMANTIC_NODES for a language, resolved once per process."""
+    parser = _get_parser(language)
+    if parser is None:
+        return frozenset()
+    return _kind_ids(parser.language, SEMANTIC_NODES.get(language, frozenset()))
+
+
+@cache
+def _name_query(language: str) -> Any | None:
+    """Compiled NAME_QUERIES entry for a language, built once per process.
+
+    Returns None when the language has no query or it doesn't compile against
+    the installed grammar; callers fall back to `extract_symbol_name`.
+    """
+    parser = _get_parser(language)
+    if parser is None or language not in NAME_QUERIES:
+        return None
+
+    try:
+        from tree_sitter import Query
+
+        return Query(parser.language, NAME_QUERIES[language])
+    except Exception:
+        return None
+
+
+def symbol_name(cursor: QueryCursor, node: Node) -> str | None:
+    """Name of a semantic unit via a name query cursor with max start depth 0.
+
+    Most patterns are rooted at the unit itself; arrow functions are named by
+    their parent declarator, so the parent is tried next.
+    """
+    for anchor in (node, node.parent):
+        if anchor is None:
+            break
+        for _, captures in cursor.matches(anchor):
+            if captures["unit"][0] == node:
+                name: bytes | None = captures["name"][0].text
+                return name.decode() if name is not None else None
+    return None
+
+
+def _point_at(source: bytes, offset: int) -> tuple[int, int]:
+    """Get the (row, byte column) tree-sitter point for a byte offset."""
+    row = source.count(b"\n", 0, offset)
+    column = offset - (source.rfind(b"\n", 0, offset) + 1)
+    return row, column
+
+
+def _common_prefix_len(a: bytes, b: bytes) -> int:
+    """Length of the common prefix, via binary search over C-level compares."""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix_len(a: bytes, b: bytes, limit: int) -> int:
+    """Length of the common suffix, at most `limit` bytes."""
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid : len(a) - lo] == b[len(b) - mid : len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class TreeCache:
+    """LRU cache of the last parse tree per file, for incremental reparsing.
+
+    The watcher only learns that a file changed, not how, so the edit passed to
+    tree-sitter is the single byte range between the common prefix and suffix
+    of the old and new source. Unchanged subtrees outside it are reused.
+    """
+
+    def __init__(self, max_entries: int = TREE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Path, tuple[bytes, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def parse(self, parser: Any, path: Path, source: bytes) -> Any:
+        """Parse `source`, reusing the previous tree for `path` if cached."""
+        entry = self._entries.pop(path, None)
+
+        if entry is None:
+            tree = parser.parse(source)
+        else:
+            old_source, tree = entry
+            if old_source != source:
+                start = _common_prefix_len(old_source, source)
+                suffix = _common_suffix_len(
+                    old_source, source, min(len(old_source), len(source)) - start
+                )
+                old_end = len(old_source) - suffix
+                new_end = len(source) - suffix
+                tree.edit(
+                    start_byte=start,
+                    old_end_byte=old_end,
+                    new_end_byte=new_end,
+                    start_point=_point_at(source, start),
+                    old_end_point=_point_at(old_source, old_end),
+                    new_end_point=_point_at(source, new_end),
+                )
+                tree = parser.parse(source, old_tree=tree)
+
+        self._entries[path] = (source, tree)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return tree
+
+
+def chunk_with_tree_sitter(
+    content: str,
+    path: Path,
+    language: str,
+    source: bytes | None = None,
+    tree_cache: TreeCache | None = None,
+) -> list[Chunk]:
+    """Chunk code using tree-sitter AST parsing.
+
+    `source` is the UTF-8 encoding of `content` when the caller already has it.
+    With a `tree_cache`, the file is reparsed incrementally from its last tree.
+    """
+    parser = _get_parser(language)
+    if parser is None:
         return []
 
-    tree = parser.parse(content.encode())
-    lines = content.splitlines()
+    if source is None:
+        source = content.encode()
+    if tree_cache is not None:
+        tree = tree_cache.parse(parser, path, source)
+    else:
+        tree = parser.parse(source)
+    index = LineIndex(content)
 
-    if not lines:
+    if not index.count:
         return []
 
     chunks: list[Chunk] = []
-    semantic_types = SEMANTIC_NODES.get(language, set())
+    semantic_kind_ids = _semantic_kind_ids(language)
+    name_query = _name_query(language)
+    if name_query is not None:
+        name_cursor = QueryCursor(name_query)
+        name_cursor.set_max_start_depth(0)
 
     # Extract header chunk (imports, top-level constants)
-    header_end = find_header_end(tree.root_node, lines)
+    header_end = find_header_end(tree.root_node)
     if header_end > 0:
-        header_content = "\n".join(lines[:header_end])
+        header_content = index.slice(0, header_end)
         if len(header_content.strip()) > 0:
             chunks.append(
                 Chunk(
@@ -109,46 +325,64 @@ def chunk_with_tree_sitter(content: str, path: Path, language: str) -> list[Chun
                 )
             )
 
-    # Extract semantic units
-    for node in walk_tree(tree.root_node):
-        if node.type in semantic_types:
-            start_line = node.start_point[0] + 1  # 1-indexed
-            end_line = node.end_point[0] + 1
+    # Extract semantic units; units small enough to be one chunk already cover
+    # their nested units, so only larger (split) ones are searched further
+    for node in walk_semantic(tree.root_node, semantic_kind_ids, MAX_CHUNK_LINES):
+        start_line = node.start_point[0] + 1  # 1-indexed
+        end_line = node.end_point[0] + 1
 
-            # Get symbol name
+        # Get symbol name
+        if name_query is not None:
+            symbol = symbol_name(name_cursor, node)
+        else:
             symbol = extract_symbol_name(node, language)
 
-            # Get content
-            chunk_lines = lines[start_line - 1 : end_line]
-            chunk_content = "\n".join(chunk_lines)
-
-            # Handle very large functions by splitting
-            if len(chunk_lines) > MAX_CHUNK_LINES:
-                sub_chunks = split_large_chunk(
-                    chunk_content, path, language, start_line, symbol
-                )
-                chunks.extend(sub_chunks)
-            else:
-                chunks.append(
-                    Chunk(
-                        file_path=path,
-                        start_line=start_line,
-                        end_line=end_line,
-                        content=chunk_content,
-                        language=language,
-                        kind=ChunkKind.CODE,
-                        symbol=symbol,
-                    )
+        # Handle very large functions by splitting
+        if min(end_line, index.count) - start_line + 1 > MAX_CHUNK_LINES:
+            sub_chunks = split_large_chunk(
+                index, path, language, start_line, end_line, symbol
+            )
+            chunks.extend(sub_chunks)
+        else:
+            chunk_content = index.slice(start_line - 1, end_line)
+            chunks.append(
+                Chunk(
+                    file_path=path,
+                    start_line=start_line,
+                    end_line=end_line,
+                    content=chunk_content,
+                    language=language,
+                    kind=ChunkKind.CODE,
+                    symbol=symbol,
                 )
+            )
 
     # If no semantic chunks found, fall back to line-based
     if not chunks:
         return []
 
-    return chunks
+    return drop_contained(chunks)
+
+
+def drop_contained(chunks: list[Chunk]) -> list[Chunk]:
+    """Drop chunks whose line range lies within another chunk's.
 
+    Sorting by (start, -end) puts every container before what it contains, so
+    one pass tracking the furthest end line kept so far finds them all. This
+    mostly removes nested units of large, split units, which the split parts
+    already cover.
+    """
+    chunks.sort(key=lambda c: (c.start_line, -c.end_line))
+    kept: list[Chunk] = []
+    last_end = 0
+    for chunk in chunks:
+        if chunk.end_line > last_end:
+            kept.append(chunk)
+            last_end = chunk.end_line
+    return kept
 
-def find_header_end(root_node, lines: list[str]) -> int:
+
+def find_header_end(root_node) -> int:
     """Find where imports/top-level declarations end."""
     header_types = {"import_statement", "import_from_statement", "use_declaration", "include"}
     last_header_line = 0
@@ -167,11 +401,31 @@ def find_header_end(root_node, lines: list[str]) -> int:
     return last_header_line
 
 
-def walk_tree(node):
-    """Walk tree-sitter AST yielding all nodes."""
-    yield node
-    for child in node.children:
-        yield from walk_tree(child)
+def walk_semantic(root, kind_ids: frozenset[int], prune_max_lines: int | None = None):
+    """Walk tree-sitter AST in pre-order, yielding nodes with the given kind ids.
+
+    Uses a native TreeCursor instead of recursing through `node.children`,
+    which avoids a Python generator frame and a children list per node, and
+    compares integer kind ids rather than building a type string per node.
+
+    With `prune_max_lines`, a matched node spanning at most that many lines is
+    not descended into, so nested units (methods in a class, the function
+    inside a decorated definition) aren't emitted a second time.
+    """
+    cursor = root.walk()
+    while True:
+        node = cursor.node
+        descend = True
+        if node.kind_id in kind_ids:
+            yield node
+            if prune_max_lines is not None:
+                descend = node.end_point[0] - node.start_point[0] + 1 > prune_max_lines
+
+        if descend and cursor.goto_first_child():
+            continue
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                return
 
 
 def extract_symbol_name(node, language: str) -> str | None:
@@ -185,39 +439,28 @@ def extract_symbol_name(node, language: str) -> str | None:
 
 
 def split_large_chunk(
-    content: str,
+    index: LineIndex,
     path: Path,
     language: str,
     start_line: int,
+    end_line: int,
     symbol: str | None,
 ) -> list[Chunk]:
-    """Split a large chunk into smaller overlapping pieces."""
-    lines = content.splitlines()
-    chunks: list[Chunk] = []
-
+    """Split a large chunk (1-indexed, inclusive lines) into overlapping pieces."""
+    first = start_line - 1  # 0-indexed
+    last = min(end_line, index.count)  # exclusive
     chunk_size = 200
     overlap = 30
-    i = 0
-
-    while i < len(lines):
-        end = min(i + chunk_size, len(lines))
-        chunk_lines = lines[i:end]
-        chunk_content = "\n".join(chunk_lines)
-
-        chunks.append(
-            Chunk(
-                file_path=path,
-                start_line=start_line + i,
-                end_line=start_line + end - 1,
-                content=chunk_content,
-                language=language,
-                kind=ChunkKind.CODE,
-                symbol=f"{symbol}[part]" if symbol else None,
-            )
-        )
-
-        if end >= len(lines):
-            break
-        i = end - overlap
 
-    return chunks
+    return [
+        Chunk(
+            file_path=path,
+            start_line=start_line + i,
+            end_line=min(first + i + chunk_size, last),
+            content=index.slice(first + i, min(first + i + chunk_size, last)),
+            language=language,
+            kind=ChunkKind.CODE,
+            symbol=f"{symbol}[part]" if symbol else None,
+        )
+        for i in window_starts(last - first, chunk_size, overlap)
+    ]
@@ -3,25 +3,38 @@
 from __future__ import annotations
 
 import contextlib
+from functools import cache
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import typer
-from rich.console import Console
 
 from probe import __version__
-from probe.config import init_workspace, load_workspace_config
+
+if TYPE_CHECKING:
+    from rich.console import Console
+
+# Heavy imports (rich, pydantic models, storage clients) live inside the
+# commands that need them so `probe --version` and `probe init` start fast.
 
 app = typer.Typer(
     name="probe",
     help="RAG memory for agentic coders via MCP.",
     no_args_is_help=True,
 )
-console = Console()
+
+
+@cache
+def get_console() -> Console:
+    """Get the shared rich console, importing rich on first use."""
+    from rich.console import Console
+
+    return Console()
 
 
 def version_callback(value: bool) -> None:
     if value:
-        console.print(f"probe {__version__}")
+        typer.echo(f"probe {__version__}")
         raise typer.Exit()
 
 
@@ -46,6 +59,9 @@ def init(
     preset: str = typer.Option("lite", "--preset", "-p", help="Preset: lite, balanced, pro"),
 ) -> None:
     """Initialize Probe for a project."""
+    from probe.config import init_workspace, load_workspace_config
+
+    console = get_console()
     project_root = path.resolve()
 
     existing = load_workspace_config(project_root)
@@ -68,9 +84,10 @@ def serve(
     import asyncio
     import sys
 
-    from probe.config import ProbeConfig
+    from probe.config import ProbeConfig, load_workspace_config
+    from probe.http_client import close_http_client
     from probe.server import run_server, set_project_root, set_watcher_state
-    from probe.storage import Manifest, QdrantClient
+    from probe.storage import QdrantClient, close_manifests, open_manifest
 
     project_root = path.resolve()
 
@@ -93,14 +110,14 @@ def serve(
 
         # Initialize storage clients for watcher
         qdrant = QdrantClient(url=config.qdrant_url, preset=workspace_config.preset)
-        await qdrant.ensure_collection()
-
-        manifest = Manifest(project_root / ".probe" / "manifest.sqlite")
-        await manifest.connect()
-
         watcher_task = None
 
         try:
+            await qdrant.ensure_collection()
+
+            # Shared with the MCP server's index_status
+            manifest = await open_manifest(project_root / ".probe" / "manifest.sqlite")
+
             if watch:
                 from probe.watcher import WatcherState, run_watcher
 
@@ -131,7 +148,9 @@ def serve(
                 watcher_task.cancel()
                 with contextlib.suppress(asyncio.CancelledError):
                     await watcher_task
-            await manifest.close()
+            await close_manifests()
+            await qdrant.close()
+            await close_http_client()
 
     asyncio.run(run_with_watcher())
 
@@ -143,10 +162,12 @@ def scan(
     """Manually trigger a full index scan."""
     import asyncio
 
-    from probe.config import ProbeConfig
+    from probe.config import ProbeConfig, load_workspace_config
+    from probe.http_client import close_http_client
     from probe.indexing import run_scan
     from probe.storage import Manifest, QdrantClient
 
+    console = get_console()
     project_root = path.resolve()
 
     workspace_config = load_workspace_config(project_root)
@@ -164,12 +185,11 @@ def scan(
     async def do_scan() -> dict[str, int]:
         # Initialize storage clients
         qdrant = QdrantClient(url=config.qdrant_url, preset=workspace_config.preset)
-        await qdrant.ensure_collection()
-
         manifest = Manifest(project_root / ".probe" / "manifest.sqlite")
-        await manifest.connect()
 
         try:
+            await qdrant.ensure_collection()
+            await manifest.connect()
             stats = await run_scan(
                 project_root=project_root,
                 repo_id=workspace_config.repo_id,
@@ -181,6 +201,8 @@ def scan(
             return stats
         finally:
             await manifest.close()
+            await qdrant.close()
+            await close_http_client()
 
     try:
         with console.status("[bold green]Indexing..."):
@@ -200,6 +222,7 @@ def prune(
     older_than: str = typer.Option("30d", "--older-than", help="Remove workspaces older than."),
 ) -> None:
     """Remove stale workspace data from Qdrant."""
+    console = get_console()
     console.print(f"[blue]Pruning workspaces older than {older_than}[/blue]")
 
     # TODO: Prune stale workspaces
@@ -209,6 +232,7 @@ def prune(
 @app.command()
 def doctor() -> None:
     """Check system health: Qdrant, TEI, reranker connectivity."""
+    console = get_console()
     console.print("[blue]Running health checks...[/blue]")
 
     # TODO: Health checks
@@ -2,9 +2,11 @@
 
 from __future__ import annotations
 
+import configparser
 import json
 import os
 import subprocess
+from functools import cache
 from pathlib import Path
 from uuid import UUID, uuid4
 
@@ -13,8 +15,27 @@ from pydantic import BaseModel
 from probe.types import WorkspaceConfig
 
 
+def _read_origin_url(project_root: Path) -> str | None:
+    """Read remote.origin.url straight from .git/config, without spawning git.
+
+    Returns None when the config can't be read this way (.git is a file in
+    worktrees and submodules) or has no origin, so the caller asks git.
+    """
+    parser = configparser.ConfigParser(strict=False, interpolation=None)
+    try:
+        parser.read_string((project_root / ".git" / "config").read_text())
+    except (OSError, UnicodeDecodeError, configparser.Error):
+        return None
+    return parser.get('remote "origin"', "url", fallback=None) or None
+
+
+@cache
 def get_repo_id(project_root: Path) -> str:
     """Get repo identifier from git remote origin URL, or directory name as fallback."""
+    url = _read_origin_url(project_root)
+    if url:
+        return url
+
     try:
         result = subprocess.run(
             ["git", "config", "--get", "remote.origin.url"],
@@ -68,14 +89,31 @@ def get_probe_dir(project_root: Path) -> Path:
     return project_root / ".probe"
 
 
+# Parsed workspace configs by path, with the (mtime_ns, size) they were read at
+_workspace_configs: dict[Path, tuple[tuple[int, int], WorkspaceConfig]] = {}
+
+
 def load_workspace_config(project_root: Path) -> WorkspaceConfig | None:
-    """Load workspace config from .probe/config.json, or None if not initialized."""
+    """Load workspace config from .probe/config.json, or None if not initialized.
+
+    The parsed config is reused until the file's mtime or size changes.
+    """
     config_path = get_probe_dir(project_root) / "config.json"
-    if not config_path.exists():
+    try:
+        stat = config_path.stat()
+    except FileNotFoundError:
+        _workspace_configs.pop(config_path, None)
         return None
 
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _workspace_configs.get(config_path)
+    if cached and cached[0] == version:
+        return cached[1]
+
     data = json.loads(config_path.read_text())
-    return WorkspaceConfig(**data)
+    config = WorkspaceConfig(**data)
+    _workspace_configs[config_path] = (version, config)
+    return config
 
 
 def save_workspace_config(project_root: Path, config: WorkspaceConfig) -> None:
@@ -0,0 +1,50 @@
+"""Shared HTTP client for TEI and reranker requests."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+from weakref import WeakKeyDictionary
+
+import httpx
+
+# Connection pool limits, shared by embedding, rerank, and health requests
+MAX_CONNECTIONS = 64
+MAX_KEEPALIVE_CONNECTIONS = 32
+
+# One client per event loop: pooled connections can't move between loops
+_clients: WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = (
+    WeakKeyDictionary()
+)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the pooled AsyncClient for the running event loop.
+
+    Reusing one client keeps connections to TEI and the reranker alive across
+    requests instead of reconnecting per call. HTTP/2 is used for https
+    endpoints when `h2` is installed (it comes with qdrant-client).
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=30.0,
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_http_client() -> None:
+    """Close the running loop's client, if one was created."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+__all__ = ["close_http_client", "get_http_client"]
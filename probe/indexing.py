@@ -2,80 +2,234 @@
 
 from __future__ import annotations
 
+import asyncio
 import hashlib
-from collections.abc import AsyncIterator
+import os
+import time
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import Executor
 from pathlib import Path
-from uuid import UUID, uuid5
+from uuid import UUID
 
-import httpx
-
-from probe.chunking import chunk_file
+from probe.chunking import CHUNKER_VERSION, TreeCache, chunk_file, create_chunk_executor
 from probe.config import ProbeConfig
+from probe.http_client import get_http_client
 from probe.storage import Manifest, QdrantClient
-from probe.types import IndexedChunk
 
 # Namespace for deterministic UUIDs
 NAMESPACE = UUID("6ba7b810-9dad-11d1-80b4-00c04fd430c8")
 
+# Max files indexed concurrently during a full scan (also sizes the chunk pool)
+SCAN_WORKERS = min(8, os.cpu_count() or 1)
+
+# Max chunk_file results kept in the manifest's chunk cache (LRU)
+CHUNK_CACHE_MAX_ENTRIES = 10_000
+
+# Files larger than this (generated code, lockfiles, data dumps) are not read
+MAX_FILE_BYTES = 1024 * 1024
+
+# Directories never scanned or watched; hidden and *.egg-info ones are skipped too
+IGNORED_DIRS = frozenset({
+    "__pycache__",
+    "node_modules",
+    "venv",
+    "dist",
+    "build",
+})
+
+# Known binary suffixes, skipped without reading
+SKIPPED_SUFFIXES = frozenset({".exe", ".dll", ".so", ".dylib", ".bin", ".dat", ".pyc"})
+
+# Files stat'ed together in worker threads while a scan enumerates files
+SCAN_STAT_BATCH = 64
+
+# A NUL byte in this many leading bytes marks a file as binary (as git does)
+BINARY_SNIFF_BYTES = 8192
+
+# Chunks sent to TEI per request (TEI's default --max-client-batch-size)
+EMBED_BATCH_SIZE = 32
+
+# Points sent to Qdrant per upsert request
+UPSERT_BATCH_SIZE = 256
+
+# Bumped when point IDs, chunk hashes or chunk boundaries are computed
+# differently; an index built with another version is rebuilt on the next scan
+INDEX_FORMAT_VERSION = "3"
+
 
 def compute_point_id(workspace_id: UUID, file_path: Path, start_line: int, end_line: int) -> UUID:
     """Compute deterministic point ID from position (not content)."""
-    key = f"{workspace_id}:{file_path}:{start_line}:{end_line}"
-    return uuid5(NAMESPACE, key)
+    return compute_point_ids(workspace_id, file_path, [(start_line, end_line)])[0]
+
+
+def compute_point_ids(
+    workspace_id: UUID, file_path: Path, positions: list[tuple[int, int]]
+) -> list[UUID]:
+    """Compute point IDs for several (start_line, end_line) positions in a file.
+
+    The workspace and path prefix is hashed once and the hash state copied
+    for each position.
+    """
+    prefix = hashlib.blake2b(
+        f"{workspace_id}:{file_path}:".encode(), digest_size=16, key=NAMESPACE.bytes
+    )
+    point_ids = []
+    for start_line, end_line in positions:
+        h = prefix.copy()
+        h.update(f"{start_line}:{end_line}".encode())
+        point_ids.append(UUID(bytes=h.digest()))
+    return point_ids
 
 
 def compute_chunk_hash(content: str) -> str:
     """Compute truncated hash for staleness detection."""
-    return hashlib.sha256(content.encode()).hexdigest()[:16]
+    return hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
 
 
 def compute_file_hash(path: Path) -> str:
-    """Compute file hash for change detection."""
-    return hashlib.sha256(path.read_bytes()).hexdigest()
+    """Compute file hash for change detection, streaming the file."""
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def looks_binary(data: bytes) -> bool:
+    """Check whether file content is binary, from its first few KiB."""
+    return b"\x00" in data[:BINARY_SNIFF_BYTES]
+
+
+def read_file(path: Path) -> tuple[bytes, str]:
+    """Read a file and hash its bytes. Blocking; run it in a thread."""
+    data = path.read_bytes()
+    return data, hashlib.sha256(data).hexdigest()
 
 
 async def embed_texts(texts: list[str], config: ProbeConfig) -> list[list[float]]:
     """Get embeddings from TEI service."""
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{config.tei_url}/embed",
-            json={"inputs": texts},
-            timeout=30.0,
-        )
-        response.raise_for_status()
-        return response.json()
-
-
-async def scan_files(project_root: Path) -> AsyncIterator[Path]:
-    """Enumerate files respecting .gitignore and default ignores."""
-    # Default ignore patterns
-    ignore_patterns = {
-        ".git",
-        ".probe",
-        "__pycache__",
-        "node_modules",
-        ".venv",
-        "venv",
-        "dist",
-        "build",
-        ".eggs",
-        "*.egg-info",
-    }
-
-    for path in project_root.rglob("*"):
-        if not path.is_file():
+    response = await get_http_client().post(
+        f"{config.tei_url}/embed",
+        json={"inputs": texts},
+        timeout=30.0,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+class EmbeddingBatcher:
+    """Coalesces embedding requests from concurrently indexed files.
+
+    Files with a few chunks each would otherwise cost one TEI round trip
+    apiece. Texts are queued until `batch_size` are pending or `linger`
+    seconds pass, then sent as one request. Each call must pass at most
+    `batch_size` texts.
+    """
+
+    def __init__(
+        self, config: ProbeConfig, batch_size: int = EMBED_BATCH_SIZE, linger: float = 0.005
+    ):
+        self.config = config
+        self.batch_size = batch_size
+        self.linger = linger
+        self._pending: list[tuple[list[str], asyncio.Future[list[list[float]]]]] = []
+        self._pending_texts = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._requests: set[asyncio.Task[None]] = set()
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """Embed `texts`, sharing a TEI request with other pending callers."""
+        if self._pending_texts + len(texts) > self.batch_size:
+            self._flush()
+
+        future: asyncio.Future[list[list[float]]] = asyncio.get_running_loop().create_future()
+        self._pending.append((texts, future))
+        self._pending_texts += len(texts)
+
+        if self._pending_texts >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.linger, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        pending, self._pending, self._pending_texts = self._pending, [], 0
+        task = asyncio.create_task(self._send(pending))
+        self._requests.add(task)
+        task.add_done_callback(self._requests.discard)
+
+    async def _send(
+        self, pending: list[tuple[list[str], asyncio.Future[list[list[float]]]]]
+    ) -> None:
+        try:
+            embeddings = await embed_texts([t for texts, _ in pending for t in texts], self.config)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for texts, future in pending:
+            if not future.done():
+                future.set_result(embeddings[offset : offset + len(texts)])
+            offset += len(texts)
+
+
+def is_ignored_dir(name: str) -> bool:
+    """Check whether a directory is never scanned or watched."""
+    return name in IGNORED_DIRS or name.startswith(".") or name.endswith(".egg-info")
+
+
+def walk_files(project_root: Path) -> Iterator[Path]:
+    """Yield files under `project_root`, pruning ignored directories.
+
+    Ignored subtrees (node_modules, .git, virtualenvs) are never listed, so
+    their size doesn't matter. scandir entries answer is_dir/is_file from the
+    directory listing without a stat per file.
+    """
+    stack = [str(project_root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                entries = list(it)
+        except OSError:
             continue
 
-        # Skip ignored directories
-        parts = path.relative_to(project_root).parts
-        if any(p in ignore_patterns or p.startswith(".") for p in parts[:-1]):
-            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if not is_ignored_dir(entry.name):
+                    stack.append(entry.path)
+            elif entry.is_file() and os.path.splitext(entry.name)[1] not in SKIPPED_SUFFIXES:
+                yield Path(entry.path)
 
-        # Skip binary/large files
-        if path.suffix in {".exe", ".dll", ".so", ".dylib", ".bin", ".dat"}:
-            continue
 
-        yield path
+def _stat(path: Path) -> os.stat_result | None:
+    """Stat a file, or None if it vanished or can't be accessed."""
+    try:
+        return path.stat()
+    except OSError:
+        return None
+
+
+async def scan_files(project_root: Path) -> AsyncIterator[tuple[Path, os.stat_result]]:
+    """Enumerate files with their stats, skipping ignored directories and binary suffixes.
+
+    The tree is walked in a worker thread, and files are stat'ed
+    SCAN_STAT_BATCH at a time in worker threads, so a large or cold tree
+    doesn't block the event loop. Files that vanish meanwhile are left out.
+    """
+    paths = await asyncio.to_thread(lambda: list(walk_files(project_root)))
+    for start in range(0, len(paths), SCAN_STAT_BATCH):
+        batch = paths[start : start + SCAN_STAT_BATCH]
+        stats = await asyncio.gather(*(asyncio.to_thread(_stat, path) for path in batch))
+        for path, stat in zip(batch, stats, strict=True):
+            if stat is not None:
+                yield path, stat
 
 
 async def index_file(
@@ -86,73 +240,151 @@ async def index_file(
     config: ProbeConfig,
     qdrant: QdrantClient,
     manifest: Manifest,
+    executor: Executor | None = None,
+    tree_cache: TreeCache | None = None,
+    embedder: EmbeddingBatcher | None = None,
+    stat: os.stat_result | None = None,
 ) -> int:
-    """Index a single file. Returns number of chunks indexed."""
+    """Index a single file. Returns number of chunks indexed.
+
+    If `executor` is given, chunking runs there instead of on the event loop.
+    Otherwise a `tree_cache` lets tree-sitter reparse the file incrementally.
+    An `embedder` shares embedding requests with other files being indexed.
+    `stat` is the file's stat result if the caller already has it.
+    """
     relative_path = file_path.relative_to(project_root)
 
     # Check if file needs reindexing
-    stat = file_path.stat()
+    if stat is None:
+        stat = file_path.stat()
     existing = await manifest.get_file(relative_path)
 
     if existing and existing["mtime"] == stat.st_mtime and existing["size"] == stat.st_size:
         # Fast skip - file unchanged
         return 0
 
-    # File changed or new - reindex
-    file_hash = compute_file_hash(file_path)
-
-    # Delete existing chunks for this file
-    await qdrant.delete_by_file(workspace_id, relative_path)
-    await manifest.delete_file_chunks(relative_path)
-
-    # Chunk the file
-    try:
-        content = file_path.read_text()
-    except UnicodeDecodeError:
-        # Skip binary files
+    if stat.st_size > MAX_FILE_BYTES:
+        # Too large to be useful search context; drop it if it grew past the limit
+        if existing:
+            await qdrant.delete_by_file(workspace_id, relative_path)
+            await manifest.delete_file(relative_path)
         return 0
 
-    chunks = chunk_file(content, relative_path)
+    # File changed or new - reindex (read once, hash and chunk the same bytes).
+    # Read and hash in a thread so other files' network calls proceed meanwhile.
+    data, file_hash = await asyncio.to_thread(read_file, file_path)
 
-    if not chunks:
-        return 0
-
-    # Embed chunks
-    texts = [c.content for c in chunks]
-    embeddings = await embed_texts(texts, config)
-
-    # Store in Qdrant and manifest
-    indexed_chunks: list[IndexedChunk] = []
-    for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings, strict=True)):
-        point_id = compute_point_id(
-            workspace_id, relative_path, chunk.start_line, chunk.end_line
-        )
-        chunk_hash = compute_chunk_hash(chunk.content)
-
-        indexed = IndexedChunk(
-            point_id=point_id,
+    if existing and existing["file_hash"] == file_hash:
+        # Only metadata changed (touch, checkout, reverted edit); keep the index
+        await manifest.upsert_file(
             file_path=relative_path,
-            start_line=chunk.start_line,
-            end_line=chunk.end_line,
-            chunk_hash=chunk_hash,
-            chunk_idx=idx,
-            language=chunk.language,
-            kind=chunk.kind,
-            symbol=chunk.symbol,
+            mtime=stat.st_mtime,
+            size=stat.st_size,
+            file_hash=file_hash,
+            error=existing["last_error"],
         )
-        indexed_chunks.append(indexed)
+        return 0
 
-        # Upsert to Qdrant
-        await qdrant.upsert_chunk(
-            point_id=point_id,
-            repo_id=repo_id,
-            workspace_id=workspace_id,
+    if looks_binary(data):
+        # Drop any earlier text version, and record the file so later scans
+        # skip it on mtime/size without reading it again
+        if existing:
+            await qdrant.delete_by_file(workspace_id, relative_path)
+            await manifest.delete_file_chunks(relative_path)
+        await manifest.upsert_file(
             file_path=relative_path,
+            mtime=stat.st_mtime,
+            size=stat.st_size,
             file_hash=file_hash,
-            chunk=chunk,
-            chunk_hash=chunk_hash,
-            dense_vector=embedding,
+            error="binary",
         )
+        return 0
+
+    # Chunk the file, reusing cached output if this exact content was seen before
+    cache_key = f"{CHUNKER_VERSION}:{relative_path}:{file_hash}"
+    chunks = await manifest.get_cached_chunks(cache_key)
+    if chunks is None:
+        try:
+            if executor is None:
+                chunks = chunk_file(data, relative_path, tree_cache=tree_cache)
+            else:
+                loop = asyncio.get_running_loop()
+                chunks = await loop.run_in_executor(executor, chunk_file, data, relative_path)
+        except UnicodeDecodeError:
+            # Not UTF-8; record it like a binary file
+            if existing:
+                await qdrant.delete_by_file(workspace_id, relative_path)
+                await manifest.delete_file_chunks(relative_path)
+            await manifest.upsert_file(
+                file_path=relative_path,
+                mtime=stat.st_mtime,
+                size=stat.st_size,
+                file_hash=file_hash,
+                error="binary",
+            )
+            return 0
+        await manifest.put_cached_chunks(cache_key, chunks)
+
+    # Vectors of chunks that are unchanged since the file was last indexed
+    # (usually all but a few after an edit) are reused instead of re-embedded
+    chunk_hashes = [compute_chunk_hash(c.content) for c in chunks]
+    point_ids = compute_point_ids(
+        workspace_id, relative_path, [(c.start_line, c.end_line) for c in chunks]
+    )
+    reused: dict[str, list[float]] = {}
+    if existing:
+        previous = await manifest.get_chunk_points(relative_path)
+        unchanged = {previous[h]: h for h in chunk_hashes if h in previous}
+        if unchanged:
+            vectors = await qdrant.get_dense_vectors(list(unchanged))
+            reused = {unchanged[pid]: vector for pid, vector in vectors.items()}
+
+    # Delete existing chunks for this file
+    await qdrant.delete_by_file(workspace_id, relative_path)
+    await manifest.delete_file_chunks(relative_path)
+
+    if not chunks:
+        return 0
+
+    # Embed chunks batch by batch, upserting points to Qdrant in requests of up
+    # to UPSERT_BATCH_SIZE, so only that many vectors are held at once
+    points = []
+    indexed_at = int(time.time())
+    for batch_start in range(0, len(chunks), EMBED_BATCH_SIZE):
+        batch = chunks[batch_start : batch_start + EMBED_BATCH_SIZE]
+        batch_hashes = chunk_hashes[batch_start : batch_start + EMBED_BATCH_SIZE]
+        texts = [c.content for c, h in zip(batch, batch_hashes, strict=True) if h not in reused]
+        new_embeddings: list[list[float]] = []
+        if texts and embedder is None:
+            new_embeddings = await embed_texts(texts, config)
+        elif texts and embedder is not None:
+            new_embeddings = await embedder.embed(texts)
+        new = iter(new_embeddings)
+        embeddings = [reused[h] if h in reused else next(new) for h in batch_hashes]
+
+        for idx, (chunk, chunk_hash, embedding) in enumerate(
+            zip(batch, batch_hashes, embeddings, strict=True), start=batch_start
+        ):
+            points.append(
+                qdrant.build_point(
+                    point_id=point_ids[idx],
+                    repo_id=repo_id,
+                    workspace_id=workspace_id,
+                    file_path=relative_path,
+                    file_hash=file_hash,
+                    chunk=chunk,
+                    chunk_hash=chunk_hash,
+                    dense_vector=embedding,
+                    indexed_at=indexed_at,
+                )
+            )
+
+        if len(points) >= UPSERT_BATCH_SIZE:
+            await qdrant.upsert_points(points)
+            points = []
+
+    # Upsert the remaining points to Qdrant
+    await qdrant.upsert_points(points)
 
     # Update manifest
     await manifest.upsert_file(
@@ -161,9 +393,15 @@ async def index_file(
         size=stat.st_size,
         file_hash=file_hash,
     )
-    await manifest.upsert_chunks(indexed_chunks)
+    await manifest.upsert_file_chunks(
+        relative_path,
+        start_lines=[c.start_line for c in chunks],
+        end_lines=[c.end_line for c in chunks],
+        chunk_hashes=chunk_hashes,
+        point_ids=point_ids,
+    )
 
-    return len(indexed_chunks)
+    return len(chunks)
 
 
 async def run_scan(
@@ -173,23 +411,65 @@ async def run_scan(
     config: ProbeConfig,
     qdrant: QdrantClient,
     manifest: Manifest,
+    workers: int = SCAN_WORKERS,
 ) -> dict[str, int]:
-    """Run a full incremental scan. Returns stats."""
+    """Run a full incremental scan. Returns stats.
+
+    Up to `workers` files are indexed at once, with chunking spread across a
+    process pool of the same size and embedding requests shared between them.
+    """
     files_scanned = 0
     chunks_indexed = 0
-
-    async for file_path in scan_files(project_root):
-        files_scanned += 1
-        count = await index_file(
-            file_path=file_path,
-            project_root=project_root,
-            repo_id=repo_id,
-            workspace_id=workspace_id,
-            config=config,
-            qdrant=qdrant,
-            manifest=manifest,
-        )
-        chunks_indexed += count
+    semaphore = asyncio.Semaphore(workers)
+    embedder = EmbeddingBatcher(config) if workers > 1 else None
+
+    # Forget files indexed under an older format so they are all reindexed,
+    # dropping their points too: their IDs won't match any new manifest row
+    if await manifest.get_workspace_meta("index_format") != INDEX_FORMAT_VERSION:
+        await qdrant.delete_workspace(workspace_id)
+        await manifest.delete_all_files()
+        await manifest.set_workspace_meta("index_format", INDEX_FORMAT_VERSION)
+
+    async def index_one(
+        file_path: Path, stat: os.stat_result, executor: Executor | None
+    ) -> None:
+        nonlocal chunks_indexed
+        try:
+            count = await index_file(
+                file_path=file_path,
+                project_root=project_root,
+                repo_id=repo_id,
+                workspace_id=workspace_id,
+                config=config,
+                qdrant=qdrant,
+                manifest=manifest,
+                executor=executor,
+                embedder=embedder,
+                stat=stat,
+            )
+            chunks_indexed += count
+        finally:
+            semaphore.release()
+
+    # A single worker chunks inline; a pool would only add IPC overhead.
+    # Pool workers are spawned lazily, once a changed file needs chunking.
+    executor = create_chunk_executor(max_workers=workers) if workers > 1 else None
+    try:
+        # Manifest writes are committed in a few large transactions, not per file
+        async with manifest.batch():
+            async with asyncio.TaskGroup() as tg:
+                async for file_path, stat in scan_files(project_root):
+                    files_scanned += 1
+                    await semaphore.acquire()
+                    tg.create_task(index_one(file_path, stat, executor))
+
+            await manifest.prune_chunk_cache(CHUNK_CACHE_MAX_ENTRIES)
+    except ExceptionGroup as eg:
+        # Surface the first failure as-is, like the sequential scan did
+        raise eg.exceptions[0] from None
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
 
     return {
         "files_scanned": files_scanned,
@@ -2,14 +2,18 @@
 
 from __future__ import annotations
 
+import asyncio
 import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 from typing import Any
 from uuid import UUID
-
-import httpx
+from weakref import WeakKeyDictionary
 
 from probe.config import ProbeConfig
+from probe.http_client import get_http_client
 from probe.storage import QdrantClient
 from probe.types import SearchResult
 
@@ -19,24 +23,106 @@ QUERY_INSTRUCTION = (
     "Query: "
 )
 
+# Recently embedded queries kept per process (LRU); agents repeat queries often
+QUERY_CACHE_MAX_ENTRIES = 1024
+
+# (TEI URL, query) -> embedding; the URL stands in for the embedding model
+_query_cache: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+
+# Most queries sent to TEI in one request when searches arrive together
+QUERY_BATCH_SIZE = 32
+
+
+class QueryBatcher:
+    """Coalesces concurrent query embeddings into shared TEI requests.
+
+    A query is sent as soon as the event loop is free, so a lone search waits
+    for nothing. Queries that arrive while a request is in flight are sent
+    together when it completes, and identical queries share one input.
+    """
+
+    def __init__(self, tei_url: str):
+        self.tei_url = tei_url
+        self._pending: dict[str, list[asyncio.Future[list[float]]]] = {}
+        self._sender: asyncio.Task[None] | None = None
+
+    async def embed(self, query: str) -> list[float]:
+        """Embed `query`, sharing a TEI request with other pending queries."""
+        future: asyncio.Future[list[float]] = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(query, []).append(future)
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.create_task(self._send_pending())
+        return await future
+
+    async def _send_pending(self) -> None:
+        while self._pending:
+            batch = dict(islice(self._pending.items(), QUERY_BATCH_SIZE))
+            for query in batch:
+                del self._pending[query]
+
+            try:
+                # Qwen3-Embedding recommends instruction-style queries for 1-5%
+                # better retrieval
+                response = await get_http_client().post(
+                    f"{self.tei_url}/embed",
+                    json={
+                        "inputs": [QUERY_INSTRUCTION + query for query in batch],
+                        "truncate": True,
+                    },
+                    timeout=10.0,
+                )
+                response.raise_for_status()
+                embeddings = response.json()
+                if not isinstance(embeddings, list) or len(embeddings) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} embeddings from TEI")
+
+                for futures, embedding in zip(batch.values(), embeddings, strict=True):
+                    for future in futures:
+                        if not future.done():
+                            future.set_result(embedding)
+            except BaseException as e:
+                # Callers are awaiting these futures; never leave one pending
+                for futures in batch.values():
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+                if not isinstance(e, Exception):
+                    raise
+
+
+# One batcher per event loop and TEI URL: futures can't move between loops
+_query_batchers: WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, QueryBatcher]] = (
+    WeakKeyDictionary()
+)
+
+
+def get_query_batcher(tei_url: str) -> QueryBatcher:
+    """Get the query batcher for the running event loop."""
+    batchers = _query_batchers.setdefault(asyncio.get_running_loop(), {})
+    batcher = batchers.get(tei_url)
+    if batcher is None:
+        batcher = batchers[tei_url] = QueryBatcher(tei_url)
+    return batcher
+
 
 async def embed_query(query: str, config: ProbeConfig) -> list[float]:
-    """Embed a search query using TEI with instruction prefix."""
-    # Qwen3-Embedding recommends instruction-style queries for 1-5% better retrieval
-    formatted_query = f"{QUERY_INSTRUCTION}{query}"
-
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{config.tei_url}/embed",
-            json={
-                "inputs": [formatted_query],
-                "truncate": True,
-            },
-            timeout=10.0,
-        )
-        response.raise_for_status()
-        embeddings = response.json()
-        return embeddings[0]
+    """Embed a search query using TEI with instruction prefix.
+
+    Results are cached, so repeated queries skip the TEI round trip, and
+    concurrent searches share requests through a QueryBatcher.
+    """
+    key = (config.tei_url, query)
+    cached = _query_cache.get(key)
+    if cached is not None:
+        _query_cache.move_to_end(key)
+        return cached
+
+    embedding = await get_query_batcher(config.tei_url).embed(query)
+
+    _query_cache[key] = embedding
+    if len(_query_cache) > QUERY_CACHE_MAX_ENTRIES:
+        _query_cache.popitem(last=False)
+    return embedding
 
 
 async def rerank(
@@ -50,24 +136,45 @@ async def rerank(
         # No reranker configured, return original order
         return [(i, 1.0 - i * 0.01) for i in range(len(documents))]
 
-    async with httpx.AsyncClient() as client:
-        payload: dict[str, Any] = {
-            "query": query,
-            "documents": documents,
-        }
-        if instruction:
-            payload["instruction"] = instruction
-
-        response = await client.post(
-            f"{config.reranker_url}/rerank",
-            json=payload,
-            timeout=5.0,  # 300ms target, 5s max
-        )
-        response.raise_for_status()
-        results = response.json()
+    payload: dict[str, Any] = {
+        "query": query,
+        "documents": documents,
+    }
+    if instruction:
+        payload["instruction"] = instruction
+
+    response = await get_http_client().post(
+        f"{config.reranker_url}/rerank",
+        json=payload,
+        timeout=5.0,  # 300ms target, 5s max
+    )
+    response.raise_for_status()
+    results = response.json()
+
+    # Expected format: [{"index": 0, "score": 0.95}, ...]
+    return [(r["index"], r["score"]) for r in results]
+
+
+# Decoded files kept for snippet generation; search hits cluster in few files
+SNIPPET_FILE_CACHE_SIZE = 128
+
+# Fusion candidates passed to the reranker: a few per requested result,
+# within bounds so small searches keep recall and large ones stay cheap
+RERANK_CANDIDATES_PER_RESULT = 3
+RERANK_MIN_CANDIDATES = 20
+RERANK_MAX_CANDIDATES = 100
+
 
-        # Expected format: [{"index": 0, "score": 0.95}, ...]
-        return [(r["index"], r["score"]) for r in results]
+@lru_cache(maxsize=SNIPPET_FILE_CACHE_SIZE)
+def _read_lines(path: Path, mtime_ns: int, size: int) -> list[str]:
+    """Read a file's lines; mtime and size in the key invalidate stale entries."""
+    return path.read_text().splitlines()
+
+
+def read_lines(path: Path) -> list[str]:
+    """Get a file's lines, decoding it only once per version."""
+    stat = path.stat()
+    return _read_lines(path, stat.st_mtime_ns, stat.st_size)
 
 
 def generate_snippet(
@@ -85,13 +192,13 @@ def generate_snippet(
         start_line: 1-indexed start line
         end_line: 1-indexed end line (inclusive)
         project_root: Absolute path to project root
-        chunk_hash: Expected hash (truncated sha256) for staleness check
+        chunk_hash: Expected hash (8-byte blake2b) for staleness check
         max_lines: Maximum lines to include in snippet
     """
     full_path = project_root / file_path
 
     try:
-        lines = full_path.read_text().splitlines()
+        lines = read_lines(full_path)
     except (FileNotFoundError, UnicodeDecodeError):
         return "(file not found or unreadable)", True
 
@@ -104,7 +211,7 @@ def generate_snippet(
     stale = False
     if chunk_hash:
         content = "\n".join(selected)
-        current_hash = hashlib.sha256(content.encode()).hexdigest()[:16]
+        current_hash = hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
         stale = current_hash != chunk_hash
 
     # Truncate for snippet display
@@ -138,8 +245,14 @@ async def search(
     query_vector = await embed_query(query, config)
 
     # Step 2: Hybrid search (dense + BM25 with RRF fusion)
-    # Request more candidates if reranking
-    fusion_limit = 30 if effective_mode == "quality" else top_k
+    # Request more candidates if reranking, scaled to the number of results
+    if effective_mode == "quality":
+        fusion_limit = min(
+            max(top_k * RERANK_CANDIDATES_PER_RESULT, RERANK_MIN_CANDIDATES),
+            max(top_k, RERANK_MAX_CANDIDATES),
+        )
+    else:
+        fusion_limit = top_k
 
     candidates = await qdrant.hybrid_search(
         workspace_id=workspace_id,
@@ -152,21 +265,27 @@ async def search(
     if not candidates:
         return []
 
-    # Step 3: Generate snippets BEFORE reranking (reranker needs actual content)
-    for c in candidates:
-        file_path = Path(c["file_path"])
-        snippet, stale = generate_snippet(
-            file_path,
-            c["start_line"],
-            c["end_line"],
-            project_root,
-            chunk_hash=c.get("chunk_hash"),
+    # Step 3: Generate snippets BEFORE reranking (reranker needs actual content).
+    # File reads run in threads so they overlap instead of blocking the loop.
+    snippets = await asyncio.gather(
+        *(
+            asyncio.to_thread(
+                generate_snippet,
+                Path(c["file_path"]),
+                c["start_line"],
+                c["end_line"],
+                project_root,
+                chunk_hash=c.get("chunk_hash"),
+            )
+            for c in candidates
         )
+    )
+    for c, (snippet, stale) in zip(candidates, snippets, strict=True):
         c["snippet"] = snippet
         c["stale"] = stale
 
-    # Step 4: Optional rerank
-    if effective_mode == "quality" and len(candidates) > 0:
+    # Step 4: Optional rerank (a single candidate has nothing to reorder)
+    if effective_mode == "quality" and len(candidates) > 1:
         # Get document texts for reranking
         doc_texts = [c["snippet"] for c in candidates]
 
@@ -5,9 +5,11 @@ from __future__ import annotations
 import asyncio
 import hashlib
 import json
+import re
 import sys
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
+from time import monotonic
 from typing import TYPE_CHECKING, Any
 
 from mcp.server import Server
@@ -15,26 +17,40 @@ from mcp.server.stdio import stdio_server
 from mcp.types import TextContent, Tool
 
 from probe.config import ProbeConfig, load_workspace_config
+from probe.http_client import close_http_client, get_http_client
 from probe.retrieval import search as retrieval_search
-from probe.storage import QdrantClient
+from probe.storage import Manifest, QdrantClient, close_manifests, open_manifest
 from probe.types import IndexStatus
 
 if TYPE_CHECKING:
     from probe.watcher import WatcherState
 
+# Backend health results are reused for this long across index_status calls
+HEALTH_CACHE_SECONDS = 5.0
+
+# Bytes read at a time when hashing the rest of a file in open_file
+READ_BLOCK_BYTES = 1 << 16
+
+# UTF-8 encoded line boundaries recognized by str.splitlines() other than "\n"
+_OTHER_LINE_BREAKS = re.compile(rb"[\r\x0b\x0c\x1c\x1d\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9]")
+
 # MCP server instance
 server = Server("probe")
 
 # Server configuration (set before running)
 _project_root: Path | None = None
+_resolved_root: Path | None = None
 _watcher_state: WatcherState | None = None
 _manifest_path: Path | None = None
+_config: ProbeConfig | None = None
+_health_cache: dict[tuple[str, ...], tuple[float, tuple[bool, bool, bool]]] = {}
 
 
 def set_project_root(path: Path) -> None:
     """Set the project root for the server."""
-    global _project_root, _manifest_path
+    global _project_root, _resolved_root, _manifest_path
     _project_root = path
+    _resolved_root = path.resolve()
     _manifest_path = path / ".probe" / "manifest.sqlite"
 
 
@@ -43,6 +59,26 @@ def get_project_root() -> Path:
     return _project_root or Path.cwd()
 
 
+def get_resolved_root() -> Path:
+    """Get the project root with symlinks resolved, for sandbox checks."""
+    return _resolved_root or Path.cwd().resolve()
+
+
+def get_config() -> ProbeConfig:
+    """Get runtime config, read from the environment once per server run."""
+    global _config
+    if _config is None:
+        _config = ProbeConfig.from_env()
+    return _config
+
+
+async def get_manifest() -> Manifest | None:
+    """Get the shared manifest connection, once the index exists."""
+    if _manifest_path and _manifest_path.exists():
+        return await open_manifest(_manifest_path)
+    return None
+
+
 def set_watcher_state(state: WatcherState) -> None:
     """Set the watcher state for index_status queries."""
     global _watcher_state
@@ -156,7 +192,7 @@ async def handle_search(args: dict[str, Any]) -> list[TextContent]:
         )]
 
     # Load runtime config (respects workspace preset via env)
-    config = ProbeConfig.from_env()
+    config = get_config()
 
     # Create Qdrant client with workspace's preset
     qdrant = QdrantClient(url=config.qdrant_url, preset=workspace_config.preset)
@@ -193,6 +229,43 @@ async def handle_search(args: dict[str, Any]) -> list[TextContent]:
 
     except Exception as e:
         return [TextContent(type="text", text=f"Error: Search failed: {e}")]
+    finally:
+        await qdrant.close()
+
+
+def read_line_range(path: Path, start_line: int, end_line: int) -> tuple[list[str], str]:
+    """Read lines start_line..end_line (1-indexed, inclusive) and the file's sha256.
+
+    The file is read in one buffered pass: lines are collected up to end_line
+    and the rest is only hashed, so only the requested range is decoded. Files
+    with line breaks other than "\n" and "\r\n" before end_line fall back to a
+    full `splitlines()`.
+    The file isn't memory-mapped, since a file truncated while mapped would
+    crash the server with SIGBUS.
+    """
+    digest = hashlib.sha256()
+    first = max(1, start_line)
+    selected: list[bytes] = []
+    with path.open("rb") as f:
+        for number, line in enumerate(f, start=1):
+            # A CRLF ending splits lines like "\n"; only other breaks need the fallback
+            body = line[:-2] if line.endswith(b"\r\n") else line
+            if _OTHER_LINE_BREAKS.search(body):
+                f.seek(0)
+                data = f.read()
+                lines = data.decode("utf-8").splitlines()
+                return lines[max(0, start_line - 1):end_line], hashlib.sha256(data).hexdigest()
+
+            digest.update(line)
+            if first <= number <= end_line:
+                selected.append(line)
+            if number >= end_line:
+                break
+
+        while block := f.read(READ_BLOCK_BYTES):
+            digest.update(block)
+
+    return b"".join(selected).decode("utf-8").splitlines(), digest.hexdigest()
 
 
 async def handle_open_file(args: dict[str, Any]) -> list[TextContent]:
@@ -203,29 +276,21 @@ async def handle_open_file(args: dict[str, Any]) -> list[TextContent]:
 
     project_root = get_project_root()
 
-    # Resolve path and validate sandbox
-    requested = (project_root / path_str).resolve()
-
-    # Security: reject symlinks that escape project root
+    # Security: resolve symlinks and reject paths that escape project root
     try:
-        real_path = requested.resolve(strict=True)
-        if not str(real_path).startswith(str(project_root)):
+        real_path = (project_root / path_str).resolve(strict=True)
+        if not real_path.is_relative_to(get_resolved_root()):
             return [TextContent(type="text", text=f"Error: Path escapes project root: {path_str}")]
     except FileNotFoundError:
         return [TextContent(type="text", text=f"Error: File not found: {path_str}")]
 
     # Read lines and get file metadata
     try:
-        file_content = real_path.read_bytes()
-        file_hash = hashlib.sha256(file_content).hexdigest()
+        selected, file_hash = await asyncio.to_thread(
+            read_line_range, real_path, start_line, end_line
+        )
         mtime = real_path.stat().st_mtime
 
-        lines = file_content.decode("utf-8").splitlines()
-        # Convert to 0-indexed, clamp to valid range
-        start_idx = max(0, start_line - 1)
-        end_idx = min(len(lines), end_line)
-        selected = lines[start_idx:end_idx]
-
         # Format with line numbers
         numbered = [f"{i + start_line}: {line}" for i, line in enumerate(selected)]
         content = "\n".join(numbered)
@@ -244,6 +309,43 @@ async def handle_open_file(args: dict[str, Any]) -> list[TextContent]:
         return [TextContent(type="text", text=f"Error reading file: {e}")]
 
 
+async def check_backends(config: ProbeConfig, preset: str) -> tuple[bool, bool, bool]:
+    """Check TEI, Qdrant, and reranker health concurrently.
+
+    Returns (dense_available, bm25_available, reranker_available). Results are
+    cached for HEALTH_CACHE_SECONDS so repeated status calls stay cheap.
+    """
+    key = (config.tei_url, config.qdrant_url, config.reranker_url or "", preset)
+    cached = _health_cache.get(key)
+    if cached and monotonic() - cached[0] < HEALTH_CACHE_SECONDS:
+        return cached[1]
+
+    client = get_http_client()
+
+    async def check_http(url: str | None) -> bool:
+        if not url:
+            return False
+        resp = await client.get(f"{url}/health", timeout=2.0)
+        return resp.status_code == 200
+
+    async def check_qdrant() -> bool:
+        qdrant = QdrantClient(url=config.qdrant_url, preset=preset)
+        try:
+            return await qdrant.health_check()
+        finally:
+            await qdrant.close()
+
+    checks = await asyncio.gather(
+        check_http(config.tei_url),
+        check_qdrant(),
+        check_http(config.reranker_url),
+        return_exceptions=True,
+    )
+    dense, bm25, reranker = (result is True for result in checks)
+    _health_cache[key] = (monotonic(), (dense, bm25, reranker))
+    return dense, bm25, reranker
+
+
 async def handle_index_status(args: dict[str, Any]) -> list[TextContent]:
     """Handle index_status tool call."""
     project_root = get_project_root()
@@ -253,19 +355,14 @@ async def handle_index_status(args: dict[str, Any]) -> list[TextContent]:
     files_indexed = 0
     chunks_indexed = 0
 
-    if _manifest_path and _manifest_path.exists():
-        from probe.storage import Manifest
-
-        manifest = Manifest(_manifest_path)
-        try:
-            await manifest.connect()
+    try:
+        manifest = await get_manifest()
+        if manifest:
             stats = await manifest.get_stats()
             files_indexed = stats.get("files_indexed", 0)
             chunks_indexed = stats.get("chunks_indexed", 0)
-        except Exception:
-            pass
-        finally:
-            await manifest.close()
+    except Exception:
+        pass
 
     # Get watcher state
     watcher_running = _watcher_state.running if _watcher_state else False
@@ -276,47 +373,14 @@ async def handle_index_status(args: dict[str, Any]) -> list[TextContent]:
     last_scan_time: datetime | None = None
     if last_scan > 0:
         # Approximate: monotonic offset from current time
-        from time import monotonic
-
         offset = monotonic() - last_scan
         last_scan_time = datetime.now(UTC) - timedelta(seconds=offset)
 
-    # Check backend connectivity
-    config = ProbeConfig.from_env()
-    backend_reachable = False
-    dense_available = False
-    bm25_available = False
-    reranker_available = False
-
-    try:
-        import httpx
-
-        # Check TEI
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.get(f"{config.tei_url}/health", timeout=2.0)
-                dense_available = resp.status_code == 200
-            except Exception:
-                pass
-
-            # Check Qdrant (BM25 is always available with Qdrant >= 1.15.2)
-            try:
-                preset = workspace_config.preset if workspace_config else "lite"
-                qdrant = QdrantClient(url=config.qdrant_url, preset=preset)
-                bm25_available = await qdrant.health_check()
-                backend_reachable = bm25_available
-            except Exception:
-                pass
-
-            # Check reranker if configured
-            if config.reranker_url:
-                try:
-                    resp = await client.get(f"{config.reranker_url}/health", timeout=2.0)
-                    reranker_available = resp.status_code == 200
-                except Exception:
-                    pass
-    except Exception:
-        pass
+    # Check backend connectivity (BM25 is always available with Qdrant >= 1.15.2)
+    config = get_config()
+    preset = workspace_config.preset if workspace_config else "lite"
+    dense_available, bm25_available, reranker_available = await check_backends(config, preset)
+    backend_reachable = bm25_available
 
     status = IndexStatus(
         watcher_running=watcher_running,
@@ -325,7 +389,7 @@ async def handle_index_status(args: dict[str, Any]) -> list[TextContent]:
         chunks_indexed=chunks_indexed,
         index_generation=index_generation,
         backend_reachable=backend_reachable,
-        current_preset=workspace_config.preset if workspace_config else "lite",
+        current_preset=preset,
         dense_available=dense_available,
         bm25_available=bm25_available,
         reranker_available=reranker_available,
@@ -342,13 +406,29 @@ async def run_server(project_root: Path | None = None) -> None:
     # Log to stderr (stdout is reserved for MCP protocol)
     print(f"Probe MCP server starting for: {get_project_root()}", file=sys.stderr)
 
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(read_stream, write_stream, server.create_initialization_options())
+    try:
+        # Open the manifest up front when possible; if it can't be opened yet
+        # (locked, corrupt), tool calls retry and report it
+        try:
+            await get_manifest()
+        except Exception as e:
+            print(f"Probe: Could not open manifest: {e}", file=sys.stderr)
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, server.create_initialization_options())
+    finally:
+        await close_http_client()
 
 
 def main(project_root: Path | None = None) -> None:
     """Entry point for running the server."""
-    asyncio.run(run_server(project_root))
+
+    async def serve() -> None:
+        try:
+            await run_server(project_root)
+        finally:
+            await close_manifests()
+
+    asyncio.run(serve())
 
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
 """Storage backends for Probe."""
 
-from probe.storage.manifest import Manifest
+from probe.storage.manifest import Manifest, close_manifests, open_manifest
 from probe.storage.qdrant import QdrantClient
 
-__all__ = ["QdrantClient", "Manifest"]
+__all__ = ["QdrantClient", "Manifest", "close_manifests", "open_manifest"]
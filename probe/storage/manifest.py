@@ -2,29 +2,178 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import sqlite3
+from collections.abc import AsyncIterator, Sequence
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Any
+from uuid import UUID
 
 import aiosqlite
-
-from probe.types import IndexedChunk
+from pydantic import TypeAdapter
+
+from probe.types import Chunk, IndexedChunk
+
+_CHUNK_LIST = TypeAdapter(list[Chunk])
+
+# Inside batch(), commit after this many writes even before the block ends
+BATCH_COMMIT_WRITES = 2000
+
+# Read-only connections opened on demand for lookups that run alongside indexing
+READ_CONNECTIONS = 4
+
+# WAL lets the MCP server read while the watcher writes, and with
+# synchronous=NORMAL a commit no longer waits for an fsync. foreign_keys makes
+# the chunks -> files ON DELETE CASCADE take effect.
+_CONNECTION_PRAGMAS = """
+    PRAGMA journal_mode = WAL;
+    PRAGMA synchronous = NORMAL;
+    PRAGMA temp_store = MEMORY;
+    PRAGMA cache_size = -64000;
+    PRAGMA mmap_size = 268435456;
+    PRAGMA wal_autocheckpoint = 1000;
+    PRAGMA foreign_keys = ON;
+"""
+
+# Each file gets a small integer id that its chunks reference, so the chunks
+# B-tree and its indexes don't repeat the path in every row
+_FILES_TABLE = """(
+    id INTEGER PRIMARY KEY,
+    file_path TEXT NOT NULL UNIQUE,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    file_hash TEXT NOT NULL,
+    last_indexed_at REAL NOT NULL DEFAULT (unixepoch()),
+    last_error TEXT
+)"""
+
+# Key-lookup tables with small rows, stored directly in their primary key
+# B-tree instead of a rowid table plus a separate primary key index
+_WITHOUT_ROWID_TABLES = {
+    "chunks": """(
+        file_id INTEGER NOT NULL,
+        start_line INTEGER NOT NULL,
+        end_line INTEGER NOT NULL,
+        chunk_hash TEXT NOT NULL,
+        point_id TEXT NOT NULL,
+        chunk_idx INTEGER NOT NULL,
+        PRIMARY KEY (file_id, start_line, end_line),
+        FOREIGN KEY (file_id) REFERENCES files(id) ON DELETE CASCADE
+    ) WITHOUT ROWID""",
+    "workspace": """(
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    ) WITHOUT ROWID""",
+}
+
+# Selects the id of the file whose path is bound to the parameter
+_FILE_ID = "(SELECT id FROM files WHERE file_path = ?)"
+
+_READER_PRAGMAS = """
+    PRAGMA query_only = 1;
+    PRAGMA temp_store = MEMORY;
+    PRAGMA cache_size = -16000;
+    PRAGMA mmap_size = 268435456;
+"""
 
 
 class Manifest:
-    """SQLite-based manifest for tracking file and chunk state."""
+    """SQLite-based manifest for tracking file and chunk state.
+
+    Writes, and reads the indexer depends on, go through one connection so
+    they see uncommitted writes of an open batch(). Status and chunk lookups
+    use a small pool of read-only connections, which WAL lets run while the
+    writer holds a transaction; they see the last committed state.
+    """
 
     def __init__(self, db_path: Path):
         self.db_path = db_path
         self._conn: aiosqlite.Connection | None = None
+        self._batch_depth = 0
+        self._pending_writes = 0
+        self._readers: list[aiosqlite.Connection] = []
+        self._idle_readers: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._opening_readers = 0
 
     async def connect(self) -> None:
         """Open database connection and ensure schema exists."""
+        if self._conn is not None:
+            return
         self._conn = await aiosqlite.connect(self.db_path)
-        await self._ensure_schema()
+        try:
+            await self._conn.executescript(_CONNECTION_PRAGMAS)
+            await self._ensure_schema()
+        except BaseException:
+            await self.close()
+            raise
+
+    @asynccontextmanager
+    async def batch(self) -> AsyncIterator[None]:
+        """Group writes into few transactions instead of one commit per write.
+
+        Writes made inside the block are committed when it exits (also on
+        error, matching autocommit) and every BATCH_COMMIT_WRITES writes.
+        """
+        assert self._conn is not None
+
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._conn is not None:
+                self._pending_writes = 0
+                await self._conn.commit()
+
+    @asynccontextmanager
+    async def _read_conn(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a read-only connection, opening one if all are busy."""
+        assert self._conn is not None
+
+        opened = len(self._readers) + self._opening_readers
+        if self._idle_readers.empty() and opened < READ_CONNECTIONS:
+            self._opening_readers += 1
+            try:
+                conn = await aiosqlite.connect(
+                    f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True
+                )
+                await conn.executescript(_READER_PRAGMAS)
+            finally:
+                self._opening_readers -= 1
+            self._readers.append(conn)
+        else:
+            conn = await self._idle_readers.get()
+
+        try:
+            yield conn
+        finally:
+            self._idle_readers.put_nowait(conn)
+
+    async def _commit(self) -> None:
+        """Commit a write, or defer it while a batch() is open."""
+        assert self._conn is not None
+
+        if self._batch_depth:
+            self._pending_writes += 1
+            if self._pending_writes < BATCH_COMMIT_WRITES:
+                return
+            self._pending_writes = 0
+        await self._conn.commit()
 
     async def close(self) -> None:
         """Close database connection."""
+        if _open_manifests.get(self.db_path) is self:
+            del _open_manifests[self.db_path]
+        readers, self._readers = self._readers, []
+        self._idle_readers = asyncio.Queue()
+        for reader in readers:
+            await reader.close()
         if self._conn:
+            # Refresh planner statistics for tables whose queries would benefit
+            with contextlib.suppress(sqlite3.Error):
+                await self._conn.execute("PRAGMA optimize")
             await self._conn.close()
             self._conn = None
 
@@ -33,38 +182,99 @@ class Manifest:
         assert self._conn is not None
 
         await self._conn.executescript(
-            """
-            CREATE TABLE IF NOT EXISTS files (
-                file_path TEXT PRIMARY KEY,
-                mtime REAL NOT NULL,
-                size INTEGER NOT NULL,
-                file_hash TEXT NOT NULL,
-                last_indexed_at REAL NOT NULL DEFAULT (unixepoch()),
-                last_error TEXT
-            );
+            f"""
+            CREATE TABLE IF NOT EXISTS files {_FILES_TABLE};
 
-            CREATE TABLE IF NOT EXISTS chunks (
-                file_path TEXT NOT NULL,
-                start_line INTEGER NOT NULL,
-                end_line INTEGER NOT NULL,
-                chunk_hash TEXT NOT NULL,
-                point_id TEXT NOT NULL,
-                chunk_idx INTEGER NOT NULL,
-                PRIMARY KEY (file_path, start_line, end_line),
-                FOREIGN KEY (file_path) REFERENCES files(file_path) ON DELETE CASCADE
-            );
+            CREATE TABLE IF NOT EXISTS chunks {_WITHOUT_ROWID_TABLES["chunks"]};
 
-            CREATE TABLE IF NOT EXISTS workspace (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL
+            CREATE TABLE IF NOT EXISTS workspace {_WITHOUT_ROWID_TABLES["workspace"]};
+
+            CREATE TABLE IF NOT EXISTS chunk_cache (
+                cache_key TEXT PRIMARY KEY,
+                chunks TEXT NOT NULL,
+                last_used REAL NOT NULL DEFAULT (unixepoch())
             );
+            """
+        )
+
+        await self._migrate_to_file_ids()
+        for name, definition in _WITHOUT_ROWID_TABLES.items():
+            await self._migrate_to_without_rowid(name, definition)
 
-            CREATE INDEX IF NOT EXISTS idx_chunks_file ON chunks(file_path);
+        await self._conn.executescript(
+            """
+            -- Serves file_id lookups too; replaces the file_path-only index
+            DROP INDEX IF EXISTS idx_chunks_file;
+            CREATE INDEX IF NOT EXISTS idx_chunks_file_idx ON chunks(file_id, chunk_idx);
             CREATE INDEX IF NOT EXISTS idx_chunks_point ON chunks(point_id);
+            CREATE INDEX IF NOT EXISTS idx_chunk_cache_used ON chunk_cache(last_used);
             """
         )
         await self._conn.commit()
 
+    async def _migrate_to_file_ids(self) -> None:
+        """Rebuild files and chunks created by an older version keyed by path."""
+        assert self._conn is not None
+
+        async with self._conn.execute(
+            "SELECT 1 FROM pragma_table_info('chunks') WHERE name = 'file_path'"
+        ) as cursor:
+            if await cursor.fetchone() is None:
+                return
+
+        # Chunks of files that are no longer recorded are dropped by the join
+        await self._rebuild_tables(
+            f"""
+            CREATE TABLE files_new {_FILES_TABLE};
+            INSERT INTO files_new (file_path, mtime, size, file_hash, last_indexed_at, last_error)
+                SELECT file_path, mtime, size, file_hash, last_indexed_at, last_error FROM files;
+            CREATE TABLE chunks_new {_WITHOUT_ROWID_TABLES["chunks"]};
+            INSERT INTO chunks_new
+                SELECT f.id, c.start_line, c.end_line, c.chunk_hash, c.point_id, c.chunk_idx
+                FROM chunks c JOIN files_new f USING (file_path);
+            DROP TABLE chunks;
+            DROP TABLE files;
+            ALTER TABLE files_new RENAME TO files;
+            ALTER TABLE chunks_new RENAME TO chunks;
+            """
+        )
+
+    async def _migrate_to_without_rowid(self, name: str, definition: str) -> None:
+        """Rebuild a table created by an older version as WITHOUT ROWID."""
+        assert self._conn is not None
+
+        async with self._conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (name,),
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None or "WITHOUT ROWID" in row[0].upper():
+            return
+
+        await self._rebuild_tables(
+            f"""
+            CREATE TABLE {name}_new {definition};
+            INSERT INTO {name}_new SELECT * FROM {name};
+            DROP TABLE {name};
+            ALTER TABLE {name}_new RENAME TO {name};
+            """
+        )
+
+    async def _rebuild_tables(self, script: str) -> None:
+        """Run a script that replaces tables, in one transaction."""
+        assert self._conn is not None
+
+        # Dropping the old tables also drops their indexes; they are recreated
+        # after. Foreign keys were not enforced before, so orphaned rows may exist.
+        await self._conn.execute("PRAGMA foreign_keys = OFF")
+        try:
+            await self._conn.executescript(f"BEGIN;\n{script}\nCOMMIT;")
+        except BaseException:
+            await self._conn.rollback()
+            raise
+        finally:
+            await self._conn.execute("PRAGMA foreign_keys = ON")
+
     async def get_file(self, file_path: Path) -> dict[str, Any] | None:
         """Get file metadata, or None if not indexed."""
         assert self._conn is not None
@@ -109,37 +319,45 @@ class Manifest:
             """,
             (str(file_path), mtime, size, file_hash, error),
         )
-        await self._conn.commit()
+        await self._commit()
 
     async def delete_file(self, file_path: Path) -> None:
-        """Delete file and its chunks from manifest."""
+        """Delete file and (through ON DELETE CASCADE) its chunks from manifest."""
         assert self._conn is not None
 
         await self._conn.execute(
             "DELETE FROM files WHERE file_path = ?",
             (str(file_path),),
         )
-        await self._conn.commit()
+        await self._commit()
+
+    async def delete_all_files(self) -> None:
+        """Delete all files and chunks from manifest."""
+        assert self._conn is not None
+
+        await self._conn.execute("DELETE FROM chunks")
+        await self._conn.execute("DELETE FROM files")
+        await self._commit()
 
     async def delete_file_chunks(self, file_path: Path) -> None:
         """Delete all chunks for a file."""
         assert self._conn is not None
 
         await self._conn.execute(
-            "DELETE FROM chunks WHERE file_path = ?",
+            f"DELETE FROM chunks WHERE file_id = {_FILE_ID}",
             (str(file_path),),
         )
-        await self._conn.commit()
+        await self._commit()
 
     async def upsert_chunks(self, chunks: list[IndexedChunk]) -> None:
         """Insert or update multiple chunks."""
         assert self._conn is not None
 
         await self._conn.executemany(
-            """
-            INSERT INTO chunks (file_path, start_line, end_line, chunk_hash, point_id, chunk_idx)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(file_path, start_line, end_line) DO UPDATE SET
+            f"""
+            INSERT INTO chunks (file_id, start_line, end_line, chunk_hash, point_id, chunk_idx)
+            VALUES ({_FILE_ID}, ?, ?, ?, ?, ?)
+            ON CONFLICT(file_id, start_line, end_line) DO UPDATE SET
                 chunk_hash = excluded.chunk_hash,
                 point_id = excluded.point_id,
                 chunk_idx = excluded.chunk_idx
@@ -156,7 +374,58 @@ class Manifest:
                 for c in chunks
             ],
         )
-        await self._conn.commit()
+        await self._commit()
+
+    async def upsert_file_chunks(
+        self,
+        file_path: Path,
+        start_lines: Sequence[int],
+        end_lines: Sequence[int],
+        chunk_hashes: Sequence[str],
+        point_ids: Sequence[UUID],
+    ) -> None:
+        """Insert or update a file's chunks, given in chunk order.
+
+        Takes parallel sequences, so the indexer doesn't build an IndexedChunk
+        per chunk, and looks up the file's id once rather than per row. The
+        file must already be recorded with upsert_file().
+        """
+        assert self._conn is not None
+
+        async with self._conn.execute(
+            "SELECT id FROM files WHERE file_path = ?", (str(file_path),)
+        ) as cursor:
+            row = await cursor.fetchone()
+        # An unrecorded file fails the NOT NULL constraint, as in upsert_chunks
+        file_id = row[0] if row else None
+
+        await self._conn.executemany(
+            """
+            INSERT INTO chunks (file_id, start_line, end_line, chunk_hash, point_id, chunk_idx)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(file_id, start_line, end_line) DO UPDATE SET
+                chunk_hash = excluded.chunk_hash,
+                point_id = excluded.point_id,
+                chunk_idx = excluded.chunk_idx
+            """,
+            [
+                (file_id, start_line, end_line, chunk_hash, str(point_id), idx)
+                for idx, (start_line, end_line, chunk_hash, point_id) in enumerate(
+                    zip(start_lines, end_lines, chunk_hashes, point_ids, strict=True)
+                )
+            ],
+        )
+        await self._commit()
+
+    async def get_chunk_points(self, file_path: Path) -> dict[str, str]:
+        """Get a file's chunk hashes mapped to their point IDs."""
+        assert self._conn is not None
+
+        async with self._conn.execute(
+            f"SELECT chunk_hash, point_id FROM chunks WHERE file_id = {_FILE_ID}",
+            (str(file_path),),
+        ) as cursor:
+            return {row[0]: row[1] for row in await cursor.fetchall()}
 
     async def get_chunk_by_position(
         self, file_path: Path, start_line: int, end_line: int
@@ -164,13 +433,14 @@ class Manifest:
         """Get chunk by position."""
         assert self._conn is not None
 
-        query = """
+        query = f"""
             SELECT chunk_hash, point_id, chunk_idx FROM chunks
-            WHERE file_path = ? AND start_line = ? AND end_line = ?
+            WHERE file_id = {_FILE_ID} AND start_line = ? AND end_line = ?
         """
-        async with self._conn.execute(
-            query, (str(file_path), start_line, end_line)
-        ) as cursor:
+        async with (
+            self._read_conn() as conn,
+            conn.execute(query, (str(file_path), start_line, end_line)) as cursor,
+        ):
             row = await cursor.fetchone()
             if row:
                 return {
@@ -186,49 +456,44 @@ class Manifest:
         """Get adjacent chunks (prev and next) for context expansion."""
         assert self._conn is not None
 
-        neighbors = []
-        async with self._conn.execute(
-            """
+        async with self._read_conn() as conn, conn.execute(
+            f"""
             SELECT start_line, end_line, chunk_hash, point_id, chunk_idx
             FROM chunks
-            WHERE file_path = ? AND chunk_idx IN (?, ?)
+            WHERE file_id = {_FILE_ID} AND chunk_idx IN (?, ?)
             ORDER BY chunk_idx
             """,
             (str(file_path), chunk_idx - 1, chunk_idx + 1),
         ) as cursor:
-            async for row in cursor:
-                neighbors.append(
-                    {
-                        "start_line": row[0],
-                        "end_line": row[1],
-                        "chunk_hash": row[2],
-                        "point_id": row[3],
-                        "chunk_idx": row[4],
-                    }
-                )
-
-        return neighbors
+            rows = await cursor.fetchall()
+
+        return [
+            {
+                "start_line": row[0],
+                "end_line": row[1],
+                "chunk_hash": row[2],
+                "point_id": row[3],
+                "chunk_idx": row[4],
+            }
+            for row in rows
+        ]
 
     async def get_stats(self) -> dict[str, int]:
         """Get index statistics."""
         assert self._conn is not None
 
-        files_count = 0
-        chunks_count = 0
-
-        async with self._conn.execute("SELECT COUNT(*) FROM files") as cursor:
-            row = await cursor.fetchone()
-            if row:
-                files_count = row[0]
-
-        async with self._conn.execute("SELECT COUNT(*) FROM chunks") as cursor:
+        # Files recorded only to be skipped (binary) don't count as indexed
+        query = """
+            SELECT
+                (SELECT COUNT(*) FROM files WHERE last_error IS NULL),
+                (SELECT COUNT(*) FROM chunks)
+        """
+        async with self._read_conn() as conn, conn.execute(query) as cursor:
             row = await cursor.fetchone()
-            if row:
-                chunks_count = row[0]
 
         return {
-            "files_indexed": files_count,
-            "chunks_indexed": chunks_count,
+            "files_indexed": row[0] if row else 0,
+            "chunks_indexed": row[1] if row else 0,
         }
 
     async def set_workspace_meta(self, key: str, value: str) -> None:
@@ -236,10 +501,13 @@ class Manifest:
         assert self._conn is not None
 
         await self._conn.execute(
-            "INSERT OR REPLACE INTO workspace (key, value) VALUES (?, ?)",
+            """
+            INSERT INTO workspace (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """,
             (key, value),
         )
-        await self._conn.commit()
+        await self._commit()
 
     async def get_workspace_meta(self, key: str) -> str | None:
         """Get workspace metadata."""
@@ -251,3 +519,79 @@ class Manifest:
         ) as cursor:
             row = await cursor.fetchone()
             return row[0] if row else None
+
+    async def get_cached_chunks(self, cache_key: str) -> list[Chunk] | None:
+        """Get cached chunk_file output, or None on a miss."""
+        assert self._conn is not None
+
+        async with self._conn.execute(
+            "SELECT chunks FROM chunk_cache WHERE cache_key = ?",
+            (cache_key,),
+        ) as cursor:
+            row = await cursor.fetchone()
+
+        if not row:
+            return None
+
+        await self._conn.execute(
+            "UPDATE chunk_cache SET last_used = unixepoch() WHERE cache_key = ?",
+            (cache_key,),
+        )
+        await self._commit()
+        return _CHUNK_LIST.validate_json(row[0])
+
+    async def put_cached_chunks(self, cache_key: str, chunks: list[Chunk]) -> None:
+        """Cache chunk_file output."""
+        assert self._conn is not None
+
+        await self._conn.execute(
+            "INSERT OR REPLACE INTO chunk_cache (cache_key, chunks) VALUES (?, ?)",
+            (cache_key, _CHUNK_LIST.dump_json(chunks).decode()),
+        )
+        await self._commit()
+
+    async def prune_chunk_cache(self, max_entries: int) -> None:
+        """Evict least recently used cache entries beyond max_entries."""
+        assert self._conn is not None
+
+        await self._conn.execute(
+            """
+            DELETE FROM chunk_cache WHERE cache_key IN (
+                SELECT cache_key FROM chunk_cache
+                ORDER BY last_used DESC
+                LIMIT -1 OFFSET ?
+            )
+            """,
+            (max_entries,),
+        )
+        await self._commit()
+
+
+# Connected manifests by database path, shared within the process
+_open_manifests: dict[Path, Manifest] = {}
+
+
+async def open_manifest(db_path: Path) -> Manifest:
+    """Get the connected Manifest for `db_path`, connecting on first use.
+
+    Sharing one connection per database (e.g. between the MCP server and the
+    watcher) avoids reopening the database and its WAL files, and starting
+    another aiosqlite thread.
+    """
+    manifest = _open_manifests.get(db_path)
+    if manifest is None:
+        manifest = Manifest(db_path)
+        await manifest.connect()
+        # Another caller may have connected while this one waited
+        if db_path in _open_manifests:
+            await manifest.close()
+            return _open_manifests[db_path]
+        _open_manifests[db_path] = manifest
+    return manifest
+
+
+async def close_manifests() -> None:
+    """Close every manifest opened through open_manifest()."""
+    while _open_manifests:
+        _, manifest = _open_manifests.popitem()
+        await manifest.close()
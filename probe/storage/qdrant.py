@@ -3,54 +3,104 @@
 from __future__ import annotations
 
 import fnmatch
-from datetime import datetime
+import re
+import time
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, TypedDict, cast
 from uuid import UUID
 
-from qdrant_client import QdrantClient as QdrantClientBase
-from qdrant_client import models
+from qdrant_client import AsyncQdrantClient, models
 
 from probe.types import Chunk
 
+
+class PresetConfig(TypedDict):
+    """Embedding model and vector storage settings for a preset."""
+
+    model: str
+    dimensions: int
+    quantization: str | None
+
+
 # Preset configurations
-PRESET_CONFIG = {
+PRESET_CONFIG: dict[str, PresetConfig] = {
     "lite": {
         "model": "Qwen/Qwen3-Embedding-0.6B",
         "dimensions": 1024,
+        # int8-quantized vectors searched first, full vectors kept for rescoring
+        "quantization": "scalar",
     },
     "balanced": {
         "model": "Qwen/Qwen3-Embedding-4B",
         "dimensions": 2560,
+        "quantization": "scalar",
     },
     "pro": {
         "model": "Qwen/Qwen3-Embedding-8B",
         "dimensions": 4096,
+        # Binary-quantized vectors in RAM, full vectors on disk for rescoring
+        "quantization": "binary",
     },
 }
 
+# Sparse BM25 vectors, built by Qdrant from document text
+BM25_MODEL = "qdrant/bm25"
+
+# Shared by every point and query; no stemming for code
+_BM25_OPTIONS = models.Bm25Config(language="none", avg_len=150)
+
+# Candidates fetched from the quantized index per result, before rescoring
+QUANTIZATION_OVERSAMPLING = 2.0
+
+# Most fused results fetched when refetching to make up for glob post-filtering
+MAX_FILTERED_FETCH = 400
+
+# Globs whose matches all contain a literal: "dir/*", "dir/**", "*.ext", "**/*.ext"
+_DIR_GLOB = re.compile(r"([^*?\[\]]+/)\*\*?")
+_EXT_GLOB = re.compile(r"(?:\*\*/)?\*(\.[^*?\[\]/.]+)")
+
+
+def glob_literal(pattern: str) -> str | None:
+    """Get a substring every path matching `pattern` contains, if it has one.
+
+    Only simple directory and extension globs are recognized.
+    """
+    match = _DIR_GLOB.fullmatch(pattern) or _EXT_GLOB.fullmatch(pattern)
+    return match.group(1) if match else None
+
+
+@lru_cache(maxsize=64)
+def compile_globs(patterns: tuple[str, ...]) -> re.Pattern[str]:
+    """Compile glob patterns into one regex matching any of them (as fnmatch)."""
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
+
 
 class QdrantClient:
     """Wrapper around Qdrant client for Probe operations."""
 
     def __init__(self, url: str, preset: str = "lite"):
-        self.client = QdrantClientBase(url=url)
+        self.client = AsyncQdrantClient(url=url)
         self.preset = preset
         self.config = PRESET_CONFIG[preset]
         self.collection_name = f"chunks_{preset}"
+        self.quantization = self.config["quantization"]
+        # Set once the collection is known to exist, skipping later checks
+        self._ensured = False
 
     async def ensure_collection(self) -> None:
         """Create collection if it doesn't exist."""
-        collections = self.client.get_collections().collections
-        exists = any(c.name == self.collection_name for c in collections)
+        if self._ensured:
+            return
 
-        if not exists:
-            self.client.create_collection(
+        if not await self.client.collection_exists(self.collection_name):
+            await self.client.create_collection(
                 collection_name=self.collection_name,
                 vectors_config={
                     "dense": models.VectorParams(
                         size=self.config["dimensions"],
                         distance=models.Distance.COSINE,
+                        on_disk=self.quantization == "binary" or None,
                     ),
                 },
                 sparse_vectors_config={
@@ -58,15 +108,89 @@ class QdrantClient:
                         modifier=models.Modifier.IDF,
                     ),
                 },
+                quantization_config=self._quantization_config(),
             )
 
             # Create payload indexes for filtering
             for field in ["repo_id", "workspace_id", "file_path", "language", "chunk_kind"]:
-                self.client.create_payload_index(
+                await self.client.create_payload_index(
                     collection_name=self.collection_name,
                     field_name=field,
                     field_schema=models.PayloadSchemaType.KEYWORD,
                 )
+            await self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name="indexed_at",
+                field_schema=models.PayloadSchemaType.INTEGER,
+            )
+
+        self._ensured = True
+
+    def _quantization_config(self) -> models.QuantizationConfig | None:
+        """Get the dense vector quantization for the preset, if any."""
+        if self.quantization == "binary":
+            return models.BinaryQuantization(
+                binary=models.BinaryQuantizationConfig(always_ram=True),
+            )
+        if self.quantization == "scalar":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8,
+                    always_ram=True,
+                ),
+            )
+        return None
+
+    def build_point(
+        self,
+        point_id: UUID,
+        repo_id: str,
+        workspace_id: UUID,
+        file_path: Path,
+        file_hash: str,
+        chunk: Chunk,
+        chunk_hash: str,
+        dense_vector: list[float],
+        indexed_at: int,
+    ) -> models.PointStruct:
+        """Build a point with dense and sparse vectors for a chunk.
+
+        `indexed_at` is a unix timestamp, shared by all points built together.
+        """
+        return models.PointStruct(
+            id=str(point_id),
+            vector={
+                "dense": dense_vector,
+                "sparse_bm25": models.Document(
+                    text=chunk.content,
+                    model=BM25_MODEL,
+                    options=_BM25_OPTIONS,
+                ),
+            },
+            payload={
+                "repo_id": repo_id,
+                "workspace_id": str(workspace_id),
+                "file_path": str(file_path),
+                "file_hash": file_hash,
+                "chunk_hash": chunk_hash,
+                "start_line": chunk.start_line,
+                "end_line": chunk.end_line,
+                "language": chunk.language,
+                "chunk_kind": chunk.kind.value,
+                "symbol": chunk.symbol,
+                "indexed_at": indexed_at,
+            },
+        )
+
+    async def upsert_points(self, points: list[models.PointStruct]) -> None:
+        """Upsert several points in one request, without waiting for them to be applied.
+
+        Qdrant applies a collection's updates in order, so a later delete or
+        upsert of the same points still takes effect after this one.
+        """
+        if not points:
+            return
+        await self.client.upsert(collection_name=self.collection_name, points=points, wait=False)
 
     async def upsert_chunk(
         self,
@@ -80,42 +204,41 @@ class QdrantClient:
         dense_vector: list[float],
     ) -> None:
         """Upsert a chunk with dense and sparse vectors."""
-        self.client.upsert(
+        await self.upsert_points(
+            [
+                self.build_point(
+                    point_id=point_id,
+                    repo_id=repo_id,
+                    workspace_id=workspace_id,
+                    file_path=file_path,
+                    file_hash=file_hash,
+                    chunk=chunk,
+                    chunk_hash=chunk_hash,
+                    dense_vector=dense_vector,
+                    indexed_at=int(time.time()),
+                )
+            ]
+        )
+
+    async def get_dense_vectors(self, point_ids: list[str]) -> dict[str, list[float]]:
+        """Get stored dense vectors by point ID; missing points are left out."""
+        records = await self.client.retrieve(
             collection_name=self.collection_name,
-            points=[
-                models.PointStruct(
-                    id=str(point_id),
-                    vector={
-                        "dense": dense_vector,
-                        "sparse_bm25": models.Document(
-                            text=chunk.content,
-                            model="qdrant/bm25",
-                            options=models.Bm25Config(
-                                language="none",  # No stemming for code
-                                avg_len=150,
-                            ),
-                        ),
-                    },
-                    payload={
-                        "repo_id": repo_id,
-                        "workspace_id": str(workspace_id),
-                        "file_path": str(file_path),
-                        "file_hash": file_hash,
-                        "chunk_hash": chunk_hash,
-                        "start_line": chunk.start_line,
-                        "end_line": chunk.end_line,
-                        "language": chunk.language,
-                        "chunk_kind": chunk.kind.value,
-                        "symbol": chunk.symbol,
-                        "indexed_at": datetime.now().isoformat(),
-                    },
-                ),
-            ],
+            ids=point_ids,
+            with_payload=False,
+            with_vectors=["dense"],
         )
+        vectors: dict[str, list[float]] = {}
+        for record in records:
+            vector = record.vector.get("dense") if isinstance(record.vector, dict) else None
+            # Skip anything but a flat dense vector (e.g. a multivector)
+            if isinstance(vector, list) and (not vector or isinstance(vector[0], float)):
+                vectors[str(record.id)] = cast(list[float], vector)
+        return vectors
 
     async def delete_by_file(self, workspace_id: UUID, file_path: Path) -> None:
         """Delete all chunks for a file."""
-        self.client.delete(
+        await self.client.delete(
             collection_name=self.collection_name,
             points_selector=models.FilterSelector(
                 filter=models.Filter(
@@ -135,7 +258,7 @@ class QdrantClient:
 
     async def delete_workspace(self, workspace_id: UUID) -> None:
         """Delete all chunks for a workspace."""
-        self.client.delete(
+        await self.client.delete(
             collection_name=self.collection_name,
             points_selector=models.FilterSelector(
                 filter=models.Filter(
@@ -159,7 +282,7 @@ class QdrantClient:
     ) -> list[dict[str, Any]]:
         """Run hybrid dense + sparse search with RRF fusion."""
         # Build filter conditions
-        must_conditions = [
+        must_conditions: list[models.Condition] = [
             models.FieldCondition(
                 key="workspace_id",
                 match=models.MatchValue(value=str(workspace_id)),
@@ -182,65 +305,105 @@ class QdrantClient:
                     )
                 )
 
+            # Narrow by a substring of the include globs when all of them have
+            # one, so fewer points are fetched only to fail the glob post-filter
+            literals = [glob_literal(p) for p in filters.get("include_globs") or []]
+            if literals and all(literals):
+                must_conditions.append(
+                    models.Filter(
+                        should=[
+                            models.FieldCondition(
+                                key="file_path",
+                                match=models.MatchText(text=literal),
+                            )
+                            for literal in literals
+                            if literal
+                        ],
+                    )
+                )
+
         search_filter = models.Filter(must=must_conditions)
 
-        # Hybrid search with RRF fusion
-        response = self.client.query_points(
-            collection_name=self.collection_name,
-            prefetch=[
-                models.Prefetch(
-                    query=query_vector,
-                    using="dense",
-                    limit=50,
-                    filter=search_filter,
-                ),
-                models.Prefetch(
-                    query=models.Document(
-                        text=query_text,
-                        model="qdrant/bm25",
-                        options=models.Bm25Config(
-                            language="none",
-                            avg_len=150,
-                        ),
-                    ),
-                    using="sparse_bm25",
-                    limit=50,
-                    filter=search_filter,
+        # Search the quantized index, then rescore the top candidates at full precision
+        dense_params = (
+            models.SearchParams(
+                quantization=models.QuantizationSearchParams(
+                    ignore=False,
+                    rescore=True,
+                    oversampling=QUANTIZATION_OVERSAMPLING,
                 ),
-            ],
-            query=models.FusionQuery(fusion=models.Fusion.RRF),
-            limit=limit,
-            with_payload=True,
+            )
+            if self.quantization
+            else None
         )
 
-        # Convert to dicts
-        results = []
-        for point in response.points:
-            payload = point.payload or {}
-            results.append(
-                {
-                    "point_id": point.id,
-                    "score": point.score,
-                    "repo_id": payload.get("repo_id"),
-                    "workspace_id": payload.get("workspace_id"),
-                    "file_path": payload.get("file_path"),
-                    "chunk_hash": payload.get("chunk_hash"),
-                    "start_line": payload.get("start_line"),
-                    "end_line": payload.get("end_line"),
-                    "language": payload.get("language"),
-                    "symbol": payload.get("symbol"),
-                    "signals": {
-                        "dense_rank": None,  # TODO: Track individual ranks
-                        "bm25_rank": None,
-                    },
-                }
+        has_globs = filters and (filters.get("include_globs") or filters.get("exclude_globs"))
+        globs = filters if has_globs else None
+        fetch_limit = limit
+        while True:
+            # Each ranking must supply at least as many candidates as are fused
+            prefetch_limit = max(fetch_limit, 50)
+
+            # Hybrid search with RRF fusion
+            response = await self.client.query_points(
+                collection_name=self.collection_name,
+                prefetch=[
+                    models.Prefetch(
+                        query=query_vector,
+                        using="dense",
+                        limit=prefetch_limit,
+                        filter=search_filter,
+                        params=dense_params,
+                    ),
+                    models.Prefetch(
+                        query=models.Document(
+                            text=query_text,
+                            model=BM25_MODEL,
+                            options=_BM25_OPTIONS,
+                        ),
+                        using="sparse_bm25",
+                        limit=prefetch_limit,
+                        filter=search_filter,
+                    ),
+                ],
+                query=models.FusionQuery(fusion=models.Fusion.RRF),
+                limit=fetch_limit,
+                with_payload=True,
             )
 
-        # Apply glob filters (post-filter since Qdrant doesn't support glob matching)
-        if filters:
-            results = self._apply_glob_filters(results, filters)
+            # Convert to dicts
+            results = []
+            for point in response.points:
+                payload = point.payload or {}
+                results.append(
+                    {
+                        "point_id": point.id,
+                        "score": point.score,
+                        "repo_id": payload.get("repo_id"),
+                        "workspace_id": payload.get("workspace_id"),
+                        "file_path": payload.get("file_path"),
+                        "chunk_hash": payload.get("chunk_hash"),
+                        "start_line": payload.get("start_line"),
+                        "end_line": payload.get("end_line"),
+                        "language": payload.get("language"),
+                        "symbol": payload.get("symbol"),
+                        "signals": {
+                            "dense_rank": None,  # TODO: Track individual ranks
+                            "bm25_rank": None,
+                        },
+                    }
+                )
 
-        return results
+            if globs is None:
+                return results
+
+            # Apply glob filters (post-filter since Qdrant doesn't support glob
+            # matching), fetching more if too few results survive
+            results = self._apply_glob_filters(results, globs)
+            exhausted = len(response.points) < fetch_limit
+            if len(results) >= limit or exhausted or fetch_limit >= MAX_FILTERED_FETCH:
+                return results[:limit]
+            fetch_limit = min(fetch_limit * 4, MAX_FILTERED_FETCH)
 
     def _apply_glob_filters(
         self,
@@ -254,30 +417,33 @@ class QdrantClient:
         if not include_globs and not exclude_globs:
             return results
 
+        include = compile_globs(tuple(include_globs)) if include_globs else None
+        exclude = compile_globs(tuple(exclude_globs)) if exclude_globs else None
+
         filtered = []
         for result in results:
             file_path = result.get("file_path", "")
 
             # Check include_globs: path must match at least one pattern
-            if include_globs and not any(
-                fnmatch.fnmatch(file_path, pattern) for pattern in include_globs
-            ):
+            if include and not include.match(file_path):
                 continue
 
             # Check exclude_globs: path must not match any pattern
-            if exclude_globs and any(
-                fnmatch.fnmatch(file_path, pattern) for pattern in exclude_globs
-            ):
+            if exclude and exclude.match(file_path):
                 continue
 
             filtered.append(result)
 
         return filtered
 
+    async def close(self) -> None:
+        """Close the client's connections."""
+        await self.client.close()
+
     async def health_check(self) -> bool:
         """Check if Qdrant is reachable."""
         try:
-            self.client.get_collections()
+            await self.client.get_collections()
             return True
         except Exception:
             return False
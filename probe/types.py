@@ -1,7 +1,12 @@
-"""Shared Pydantic models for Probe."""
+"""Shared types for Probe.
+
+Objects built per chunk or result are slotted dataclasses; configuration and
+status that cross the API boundary are Pydantic models.
+"""
 
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 from pathlib import Path
@@ -19,7 +24,8 @@ class ChunkKind(str, Enum):
     CONFIG = "config"
 
 
-class Chunk(BaseModel):
+@dataclass(slots=True, frozen=True)
+class Chunk:
     """A semantic chunk of a file."""
 
     file_path: Path
@@ -31,21 +37,23 @@ class Chunk(BaseModel):
     symbol: str | None = None  # function/class name if applicable
 
 
-class IndexedChunk(BaseModel):
+@dataclass(slots=True, frozen=True)
+class IndexedChunk:
     """A chunk stored in the index with metadata."""
 
     point_id: UUID
     file_path: Path
     start_line: int
     end_line: int
-    chunk_hash: str  # sha256 truncated to 16 chars
+    chunk_hash: str  # 8-byte blake2b, 16 hex chars
     chunk_idx: int  # 0-based index within file
     language: str | None = None
     kind: ChunkKind = ChunkKind.CODE
     symbol: str | None = None
 
 
-class SearchResult(BaseModel):
+@dataclass(slots=True, frozen=True)
+class SearchResult:
     """A single search result."""
 
     repo_id: str
@@ -55,9 +63,9 @@ class SearchResult(BaseModel):
     end_line: int
     snippet: str
     score: float
-    stale: bool = False
     source: str  # "path#Lstart-Lend"
-    signals: dict[str, Any] = Field(default_factory=dict)
+    stale: bool = False
+    signals: dict[str, Any] = field(default_factory=dict)
 
 
 class IndexStatus(BaseModel):
@@ -3,32 +3,60 @@
 from __future__ import annotations
 
 import asyncio
+import os
+import re
 import sys
-from collections.abc import Callable, Coroutine
+from collections import deque
+from collections.abc import Callable, Coroutine, Mapping
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 from time import monotonic
 from typing import Any
 from uuid import UUID
 
-from watchfiles import Change, awatch
+from watchfiles import Change, DefaultFilter, awatch
 
+from probe.chunking import TreeCache
 from probe.config import ProbeConfig
-from probe.indexing import index_file, run_scan
+from probe.indexing import IGNORED_DIRS, SKIPPED_SUFFIXES, index_file, run_scan
 from probe.storage import Manifest, QdrantClient
 
 
-@dataclass
+@dataclass(slots=True)
 class WatcherState:
     """Mutable state for the watcher."""
 
     running: bool = False
     last_scan_time: float = 0.0
     index_generation: int = 0
-    pending_paths: set[Path] = field(default_factory=set)
+    # Absolute paths as watchfiles reports them; strings are cheaper to hash
+    # and keep than Path objects, and become Paths only when indexed
+    pending_paths: set[str] = field(default_factory=set)
     last_change_time: float = 0.0
-    burst_count: int = 0
-    burst_start_time: float = 0.0
+    # (time, files changed) for recent event batches, oldest first
+    burst_events: deque[tuple[float, int]] = field(default_factory=deque)
+    trees: TreeCache = field(default_factory=TreeCache)
+    # Full scans run one at a time; the count lets a waiting request see that
+    # a scan started after it was made, and so already covers it
+    scan_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    scans_started: int = 0
+
+    @property
+    def burst_count(self) -> int:
+        """Files changed within the recorded burst window."""
+        return sum(count for _, count in self.burst_events)
+
+    def record_burst(self, now: float, count: int) -> int:
+        """Record `count` changed files at `now`, returning the burst count.
+
+        Batches older than BURST_WINDOW_SECONDS drop out of the window one by
+        one, instead of the count resetting when a fixed window ends.
+        """
+        while self.burst_events and self.burst_events[0][0] < now - BURST_WINDOW_SECONDS:
+            self.burst_events.popleft()
+        self.burst_events.append((now, count))
+        return self.burst_count
 
 
 # Configuration constants per plan.md section 7
@@ -40,66 +68,131 @@ BURST_WINDOW_SECONDS = 5.0  # Window for burst detection
 RESCAN_INTERVAL_SECONDS = 15 * 60  # 15 minute periodic rescan
 
 
-def _should_ignore(path: Path, project_root: Path) -> bool:
+# Matches a relative POSIX directory path ending in "/" that is, or is inside,
+# an ignored directory (as is_ignored_dir)
+_IGNORED_DIR = re.compile(
+    r"(?:^|/)(?:{dirs}|\.[^/]*|[^/]*\.egg-info)/".format(
+        dirs="|".join(re.escape(d) for d in sorted(IGNORED_DIRS)),
+    )
+)
+# Matches a file name with a binary suffix
+_SKIPPED_NAME = re.compile(
+    r".\.(?:{suffixes})$".format(
+        suffixes="|".join(re.escape(s[1:]) for s in sorted(SKIPPED_SUFFIXES)),
+    )
+)
+
+
+@lru_cache(maxsize=4096)
+def _dir_ignored(directory: str) -> bool:
+    """Check if a relative directory path is ignored.
+
+    Cached because events arrive in runs from the same directory; the rules
+    are fixed at import, so entries never go stale.
+    """
+    return _IGNORED_DIR.search(f"{directory}/") is not None
+
+
+@lru_cache(maxsize=8)
+def _root_prefix(project_root: Path) -> str:
+    """Get the project root as a string ending in a separator."""
+    return os.path.join(project_root, "")
+
+
+@lru_cache(maxsize=8)
+def _git_head(project_root: Path) -> str:
+    """Get the path of the project's .git/HEAD as a string."""
+    return os.path.join(project_root, ".git", "HEAD")
+
+
+def _should_ignore(path: str | Path, project_root: Path) -> bool:
     """Check if path should be ignored."""
-    try:
-        relative = path.relative_to(project_root)
-    except ValueError:
+    # String prefix check; much cheaper than Path.relative_to per event
+    root = _root_prefix(project_root)
+    path_str = os.fspath(path)
+    if not path_str.startswith(root):
         return True  # Outside project root
+    relative = path_str[len(root) :].replace(os.sep, "/")
 
-    parts = relative.parts
-
-    # Ignore patterns
-    ignore_dirs = {
-        ".git",
-        ".probe",
-        "__pycache__",
-        "node_modules",
-        ".venv",
-        "venv",
-        "dist",
-        "build",
-        ".eggs",
-    }
-
-    # Skip if in ignored directory (except .git/HEAD for branch detection)
-    for part in parts[:-1]:
-        if part in ignore_dirs or part.startswith("."):
-            # Allow .git/HEAD specifically for branch detection
-            return parts != (".git", "HEAD")
+    # Allow .git/HEAD specifically for branch detection
+    if relative == ".git/HEAD":
+        return False
 
-    # Skip binary files
-    return path.suffix in {".exe", ".dll", ".so", ".dylib", ".bin", ".dat", ".pyc"}
+    # Skip files in ignored directories, and binary files
+    directory, _, name = relative.rpartition("/")
+    return _dir_ignored(directory) or _SKIPPED_NAME.search(name) is not None
 
 
-def _is_branch_switch(path: Path, project_root: Path) -> bool:
+def _is_branch_switch(path: str | Path, project_root: Path) -> bool:
     """Check if change is a branch switch (.git/HEAD change)."""
+    return os.fspath(path) == _git_head(project_root)
+
+
+def _fingerprint(path: Path) -> tuple[float, int] | None:
+    """Get a file's (mtime, size), or None if it's gone or inaccessible."""
     try:
-        relative = path.relative_to(project_root)
-        return relative.parts == (".git", "HEAD")
-    except ValueError:
-        return False
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime, stat.st_size
 
 
-async def _wait_for_stable(path: Path, timeout: float = STABLE_CHECK_SECONDS) -> bool:
-    """Wait for file to stabilize (mtime stops changing)."""
-    if not path.exists():
-        return True  # Deleted files are "stable"
+class WatchFilter(DefaultFilter):
+    """watchfiles filter keeping only events the watcher acts on.
 
-    try:
-        initial_stat = path.stat()
-        await asyncio.sleep(timeout)
+    Events for ignored paths and deletions are dropped inside awatch, before
+    they are batched and yielded, as are editor swap, backup and lock files
+    (watchfiles' default rules). .git/HEAD is kept for branch detection
+    (the default rules drop everything under .git).
+    """
 
-        if not path.exists():
-            return True
+    # Vim also writes a "4913" file to probe whether a directory is writable
+    ignore_entity_patterns = (*DefaultFilter.ignore_entity_patterns, r"^4913$")
+
+    def __init__(self, project_root: Path):
+        super().__init__()
+        self.project_root = project_root
 
-        final_stat = path.stat()
+    def __call__(self, change: Change, path: str) -> bool:
+        if _is_branch_switch(path, self.project_root):
+            return True
         return (
-            initial_stat.st_mtime == final_stat.st_mtime
-            and initial_stat.st_size == final_stat.st_size
+            change != Change.deleted
+            and not _should_ignore(path, self.project_root)
+            and super().__call__(change, path)
         )
-    except OSError:
-        return True  # File inaccessible, treat as stable
+
+
+async def _fingerprints(paths: list[Path]) -> list[tuple[float, int] | None]:
+    """Stat files in worker threads, so the event loop isn't blocked on disk."""
+    return await asyncio.gather(*(asyncio.to_thread(_fingerprint, path) for path in paths))
+
+
+async def _stable_paths(
+    paths: set[Path],
+    indexed: Mapping[Path, tuple[float, int]] | None = None,
+    timeout: float = STABLE_CHECK_SECONDS,
+) -> set[Path]:
+    """Get the files in `paths` that exist and stop changing (mtime and size).
+
+    All files are watched across one shared wait rather than one wait each.
+    Files whose fingerprint matches `indexed` are already up to date and are
+    left out without waiting.
+    """
+    indexed = indexed or {}
+    candidates = list(paths)
+    initial = {
+        path: fp
+        for path, fp in zip(candidates, await _fingerprints(candidates), strict=True)
+        if fp is not None and fp != indexed.get(path)
+    }
+    if not initial:
+        return set()
+
+    await asyncio.sleep(timeout)
+    remaining = list(initial)
+    final = await _fingerprints(remaining)
+    return {path for path, fp in zip(remaining, final, strict=True) if fp == initial[path]}
 
 
 async def process_changes(
@@ -110,29 +203,34 @@ async def process_changes(
     config: ProbeConfig,
     qdrant: QdrantClient,
     manifest: Manifest,
+    tree_cache: TreeCache | None = None,
 ) -> int:
     """Process a batch of changed files. Returns chunks indexed."""
     total_chunks = 0
 
+    # Fingerprints recorded when files were last indexed
+    indexed: dict[Path, tuple[float, int]] = {}
     for path in paths:
-        if not path.exists():
-            # File was deleted - handled by manifest cleanup on next scan
-            continue
-
-        if not await _wait_for_stable(path):
-            # File still changing, will catch on next batch
-            continue
+        existing = await manifest.get_file(path.relative_to(project_root))
+        if existing:
+            indexed[path] = (existing["mtime"], existing["size"])
 
+    # Deleted files are handled by manifest cleanup on the next scan, and files
+    # still changing are caught on a later batch
+    for path in await _stable_paths(paths, indexed):
         try:
-            chunks = await index_file(
-                file_path=path,
-                project_root=project_root,
-                repo_id=repo_id,
-                workspace_id=workspace_id,
-                config=config,
-                qdrant=qdrant,
-                manifest=manifest,
-            )
+            # Commit the file's manifest writes together, not one by one
+            async with manifest.batch():
+                chunks = await index_file(
+                    file_path=path,
+                    project_root=project_root,
+                    repo_id=repo_id,
+                    workspace_id=workspace_id,
+                    config=config,
+                    qdrant=qdrant,
+                    manifest=manifest,
+                    tree_cache=tree_cache,
+                )
             total_chunks += chunks
         except Exception as e:
             print(f"Watcher: Error indexing {path}: {e}", file=sys.stderr)
@@ -166,6 +264,36 @@ async def run_watcher(
     state.last_scan_time = monotonic()
     print(f"Watcher: Started watching {project_root}", file=sys.stderr)
 
+    async def full_scan(reason: str) -> None:
+        """Run a full scan, unless one starts while this request waits for another."""
+        requested = state.scans_started
+        async with state.scan_lock:
+            if state.scans_started != requested:
+                return
+            state.scans_started += 1
+            # The scan covers every change counted toward a burst so far
+            state.burst_events.clear()
+
+            try:
+                stats = await run_scan(
+                    project_root=project_root,
+                    repo_id=repo_id,
+                    workspace_id=workspace_id,
+                    config=config,
+                    qdrant=qdrant,
+                    manifest=manifest,
+                )
+                state.last_scan_time = monotonic()
+                state.index_generation += 1
+                print(
+                    f"Watcher: {reason} scan complete - {stats['chunks_indexed']} chunks",
+                    file=sys.stderr,
+                )
+                if on_scan_complete:
+                    await on_scan_complete()
+            except Exception as e:
+                print(f"Watcher: {reason} scan failed: {e}", file=sys.stderr)
+
     # Background task for periodic rescan
     async def periodic_rescan() -> None:
         while state.running:
@@ -176,25 +304,7 @@ async def run_watcher(
             elapsed = monotonic() - state.last_scan_time
             if elapsed >= RESCAN_INTERVAL_SECONDS:
                 print("Watcher: Periodic rescan triggered", file=sys.stderr)
-                try:
-                    stats = await run_scan(
-                        project_root=project_root,
-                        repo_id=repo_id,
-                        workspace_id=workspace_id,
-                        config=config,
-                        qdrant=qdrant,
-                        manifest=manifest,
-                    )
-                    state.last_scan_time = monotonic()
-                    state.index_generation += 1
-                    print(
-                        f"Watcher: Periodic scan complete - {stats['chunks_indexed']} chunks",
-                        file=sys.stderr,
-                    )
-                    if on_scan_complete:
-                        await on_scan_complete()
-                except Exception as e:
-                    print(f"Watcher: Periodic scan failed: {e}", file=sys.stderr)
+                await full_scan("Periodic")
 
     # Start periodic rescan task
     rescan_task = asyncio.create_task(periodic_rescan())
@@ -202,28 +312,19 @@ async def run_watcher(
     # Debounce flush task
     flush_task: asyncio.Task[None] | None = None
 
-    async def flush_pending() -> None:
-        """Flush pending changes after debounce period."""
-        nonlocal flush_task
-
-        await asyncio.sleep(DEBOUNCE_SECONDS)
-
-        if not state.pending_paths:
-            return
-
-        paths_to_process = state.pending_paths.copy()
-        state.pending_paths.clear()
-
-        print(f"Watcher: Processing {len(paths_to_process)} changed files", file=sys.stderr)
+    async def index_changes(paths: set[str]) -> None:
+        """Index changed files and publish a new generation if any were indexed."""
+        print(f"Watcher: Processing {len(paths)} changed files", file=sys.stderr)
 
         chunks = await process_changes(
-            paths=paths_to_process,
+            paths={Path(path) for path in paths},
             project_root=project_root,
             repo_id=repo_id,
             workspace_id=workspace_id,
             config=config,
             qdrant=qdrant,
             manifest=manifest,
+            tree_cache=state.trees,
         )
 
         if chunks > 0:
@@ -233,32 +334,54 @@ async def run_watcher(
             if on_scan_complete:
                 await on_scan_complete()
 
-        flush_task = None
+    async def flush_pending(leading: set[str] | None = None) -> None:
+        """Flush pending changes after debounce period.
+
+        `leading` changes are indexed first, without waiting; changes that
+        arrive meanwhile are pending and flushed after the debounce period.
+        """
+        nonlocal flush_task
+
+        try:
+            if leading:
+                try:
+                    await index_changes(leading)
+                except asyncio.CancelledError:
+                    # Leave them for the next flush or full scan
+                    state.pending_paths.update(leading)
+                    raise
+
+            await asyncio.sleep(DEBOUNCE_SECONDS)
+
+            if not state.pending_paths:
+                return
+
+            # Take the pending set whole; new changes collect in a fresh one
+            paths_to_process, state.pending_paths = state.pending_paths, set()
+            await index_changes(paths_to_process)
+        finally:
+            # A cancelled flush may already have been replaced by a new one
+            if flush_task is asyncio.current_task():
+                flush_task = None
 
     try:
-        async for changes in awatch(project_root, recursive=True):
+        watch_filter = WatchFilter(project_root)
+        async for changes in awatch(project_root, recursive=True, watch_filter=watch_filter):
             if not state.running:
                 break
 
             now = monotonic()
-            files_changed: set[Path] = set()
+            files_changed: set[str] = set()
             branch_switched = False
 
-            for change_type, path_str in changes:
-                path = Path(path_str)
-
+            for _, path in changes:
                 # Check for branch switch
                 if _is_branch_switch(path, project_root):
                     branch_switched = True
                     continue
 
-                # Skip ignored paths
-                if _should_ignore(path, project_root):
-                    continue
-
-                # Only process file modifications and creations
-                if change_type in (Change.modified, Change.added):
-                    files_changed.add(path)
+                # Ignored paths and deletions were dropped by watch_filter
+                files_changed.add(path)
 
             # Handle branch switch - trigger full scan
             if branch_switched:
@@ -268,74 +391,41 @@ async def run_watcher(
                     flush_task.cancel()
                     flush_task = None
 
-                try:
-                    stats = await run_scan(
-                        project_root=project_root,
-                        repo_id=repo_id,
-                        workspace_id=workspace_id,
-                        config=config,
-                        qdrant=qdrant,
-                        manifest=manifest,
-                    )
-                    state.last_scan_time = monotonic()
-                    state.index_generation += 1
-                    print(
-                        f"Watcher: Branch scan complete - {stats['chunks_indexed']} chunks",
-                        file=sys.stderr,
-                    )
-                    if on_scan_complete:
-                        await on_scan_complete()
-                except Exception as e:
-                    print(f"Watcher: Branch scan failed: {e}", file=sys.stderr)
+                await full_scan("Branch")
                 continue
 
             if not files_changed:
                 continue
 
             # Burst detection
-            if now - state.burst_start_time > BURST_WINDOW_SECONDS:
-                state.burst_count = 0
-                state.burst_start_time = now
-
-            state.burst_count += len(files_changed)
+            burst_count = state.record_burst(now, len(files_changed))
 
-            if state.burst_count > BURST_THRESHOLD:
+            if burst_count > BURST_THRESHOLD:
                 # Too many changes - trigger full scan instead
                 print(
-                    f"Watcher: Burst detected ({state.burst_count} events), scheduling full scan",
+                    f"Watcher: Burst detected ({burst_count} events), scheduling full scan",
                     file=sys.stderr,
                 )
                 state.pending_paths.clear()
-                state.burst_count = 0
 
                 if flush_task:
                     flush_task.cancel()
                     flush_task = None
 
-                try:
-                    stats = await run_scan(
-                        project_root=project_root,
-                        repo_id=repo_id,
-                        workspace_id=workspace_id,
-                        config=config,
-                        qdrant=qdrant,
-                        manifest=manifest,
-                    )
-                    state.last_scan_time = monotonic()
-                    state.index_generation += 1
-                    print(
-                        f"Watcher: Burst scan complete - {stats['chunks_indexed']} chunks",
-                        file=sys.stderr,
-                    )
-                    if on_scan_complete:
-                        await on_scan_complete()
-                except Exception as e:
-                    print(f"Watcher: Burst scan failed: {e}", file=sys.stderr)
+                await full_scan("Burst")
+                continue
+
+            # Leading edge: the first change after a quiet period is indexed
+            # right away; changes that follow it are debounced. It runs as the
+            # flush task, so events keep being consumed meanwhile.
+            quiet = now - state.last_change_time > DEBOUNCE_SECONDS
+            state.last_change_time = now
+            if quiet and not flush_task and not state.pending_paths:
+                flush_task = asyncio.create_task(flush_pending(files_changed))
                 continue
 
             # Add to pending and reset debounce
             state.pending_paths.update(files_changed)
-            state.last_change_time = now
 
             # Check max wait
             first_change_time = now - len(state.pending_paths) * 0.01  # Approximate
@@ -7,25 +7,72 @@ Supports:
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import os
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from importlib.util import find_spec
 from typing import Any
 
 import torch
 import uvicorn
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ValidationError
 
 # Configuration
 MODEL_ID = os.getenv("MODEL_ID", "Qwen/Qwen3-Reranker-0.6B")
 HOST = os.getenv("HOST", "127.0.0.1")  # Default to localhost for security
 PORT = int(os.getenv("PORT", "8083"))
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-
-app = FastAPI(title="Probe Reranker", version="0.1.0")
+# Documents scored per forward pass, padded tokens per forward pass, and
+# longest prompt in tokens
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "32"))
+MAX_BATCH_TOKENS = int(os.getenv("MAX_BATCH_TOKENS", "32768"))
+MAX_LENGTH = int(os.getenv("MAX_LENGTH", "8192"))
+# Compile the Qwen forward pass on GPU; COMPILE=0 runs it eagerly
+COMPILE = os.getenv("COMPILE", "1") != "0"
+# Qwen weight quantization on GPU: none, int8 or nf4 (bitsandbytes)
+QUANTIZATION = os.getenv("QUANTIZATION", "none").lower()
+# Scores kept for repeated (instruction, query, document) triples; 0 disables
+SCORE_CACHE_SIZE = int(os.getenv("SCORE_CACHE_SIZE", "100000"))
+# Prompt lengths are padded to a multiple of this, bounding the shapes compiled
+PAD_TO_MULTIPLE_OF = 64
+# Batch shapes (rows, padded length) run at startup when the model is compiled
+WARMUP_BATCH_SIZES = (1, 4, 16, 64)
+WARMUP_LENGTHS = (128, 256, 512, 1024)
+# Runs per warm-up shape; reduce-overhead records its CUDA graph on a later run
+WARMUP_RUNS = 3
+
+# orjson serializes responses several times faster than the stdlib json
+app = FastAPI(title="Probe Reranker", version="0.1.0", default_response_class=ORJSONResponse)
+
+# System prompt for Qwen reranker
+QWEN_SYSTEM_PROMPT = (
+    "Judge whether the Document meets the requirements based on the Query "
+    "and the Instruct provided. Note that the answer can only be 'yes' or 'no'."
+)
+
+# Warm-up and every forward pass run on this one thread: reduce-overhead CUDA
+# graphs are captured per thread, so scoring reuses the graphs warm_up()
+# captured instead of each worker capturing its own. It also serializes
+# forward passes, bounding peak memory under load.
+_scoring_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scoring")
 
 # Model loading (lazy)
 _model = None
 _tokenizer = None
+_compiled = False
+
+# Qwen yes/no token IDs and the chat template around the user message,
+# tokenized once at load so requests only tokenize their own text
+_yes_id = 0
+_no_id = 0
+_prompt_prefix_ids: list[int] = []
+_prompt_suffix_ids: list[int] = []
 
 
 class RerankRequest(BaseModel):
@@ -51,7 +98,7 @@ class RerankResponse(BaseModel):
 
 def get_model():
     """Lazy load the reranker model."""
-    global _model, _tokenizer
+    global _model, _tokenizer, _compiled, _yes_id, _no_id, _prompt_prefix_ids, _prompt_suffix_ids
 
     if _model is None:
         if "zerank" in MODEL_ID.lower():
@@ -62,19 +109,239 @@ def get_model():
             _tokenizer = None  # Not needed for CrossEncoder
         else:
             # Qwen3-Reranker: LM-style scoring
-            from transformers import AutoModelForCausalLM, AutoTokenizer
+            from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
 
-            _tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, trust_remote_code=True)
+            # Left padding keeps every prompt's last token in the final position
+            _tokenizer = AutoTokenizer.from_pretrained(
+                MODEL_ID, padding_side="left", trust_remote_code=True
+            )
+            if DEVICE == "cuda":
+                dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+                # FlashAttention-2 when flash-attn is installed, else PyTorch SDPA
+                attention = "flash_attention_2" if find_spec("flash_attn") else "sdpa"
+            else:
+                dtype = torch.float32
+                attention = "sdpa"
+
+            quantization_config = None
+            if DEVICE == "cuda" and QUANTIZATION == "int8":
+                quantization_config = BitsAndBytesConfig(load_in_8bit=True)
+            elif DEVICE == "cuda" and QUANTIZATION == "nf4":
+                quantization_config = BitsAndBytesConfig(
+                    load_in_4bit=True,
+                    bnb_4bit_compute_dtype=dtype,
+                    bnb_4bit_quant_type="nf4",
+                )
+            elif QUANTIZATION != "none":
+                print(f"Ignoring QUANTIZATION={QUANTIZATION} (needs int8 or nf4 on cuda)")
             _model = AutoModelForCausalLM.from_pretrained(
                 MODEL_ID,
-                torch_dtype=torch.float16 if DEVICE == "cuda" else torch.float32,
+                torch_dtype=dtype,
+                attn_implementation=attention,
+                quantization_config=quantization_config,
                 device_map="auto" if DEVICE == "cuda" else None,
                 trust_remote_code=True,
             )
 
+            _yes_id = _tokenizer.encode("yes", add_special_tokens=False)[0]
+            _no_id = _tokenizer.encode("no", add_special_tokens=False)[0]
+
+            # Only the yes/no logits are read, so the LM head is cut down from
+            # the whole vocabulary to those two rows: [yes, no]
+            lm_head = _model.lm_head
+            yes_no_head = torch.nn.Linear(
+                lm_head.in_features,
+                2,
+                bias=False,
+                device=lm_head.weight.device,
+                dtype=lm_head.weight.dtype,
+            )
+            with torch.no_grad():
+                yes_no_head.weight.copy_(lm_head.weight[[_yes_id, _no_id]])
+            _model.lm_head = yes_no_head
+
+            # bitsandbytes layers don't compile; quantized models run eagerly
+            if DEVICE == "cuda" and COMPILE and quantization_config is None:
+                _model.forward = torch.compile(_model.forward, mode="reduce-overhead", dynamic=True)
+                _compiled = True
+
+            placeholder = "\0"
+            rendered = _tokenizer.apply_chat_template(
+                [
+                    {"role": "system", "content": QWEN_SYSTEM_PROMPT},
+                    {"role": "user", "content": placeholder},
+                ],
+                tokenize=False,
+                add_generation_prompt=True,
+            )
+            prefix, suffix = rendered.split(placeholder)
+            _prompt_prefix_ids = _tokenizer.encode(prefix, add_special_tokens=False)
+            _prompt_suffix_ids = _tokenizer.encode(suffix, add_special_tokens=False)
+
     return _model, _tokenizer
 
 
+def qwen_user_messages(query: str, documents: list[str], instruction: str | None) -> list[str]:
+    """Build the Qwen3-Reranker user message for each document."""
+    if instruction:
+        scaffold = f"<Instruct>: {instruction}\n\n<Query>: {query}\n\n<Document>: "
+    else:
+        scaffold = f"<Query>: {query}\n\n<Document>: "
+    return [scaffold + doc for doc in documents]
+
+
+def length_batches(lengths: list[int]) -> Iterator[list[int]]:
+    """Group sequence indices into forward passes by padded length.
+
+    Sequences are taken shortest first, and a batch grows while it has fewer
+    than BATCH_SIZE rows and its padded size stays within MAX_BATCH_TOKENS, so
+    short documents share large batches and long ones get small batches.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batch: list[int] = []
+    for i in order:
+        padded = -(-lengths[i] // PAD_TO_MULTIPLE_OF) * PAD_TO_MULTIPLE_OF
+        if batch and (len(batch) >= BATCH_SIZE or padded * (len(batch) + 1) > MAX_BATCH_TOKENS):
+            yield batch
+            batch = []
+        batch.append(i)
+    if batch:
+        yield batch
+
+
+def score_with_qwen(users: list[str], model: Any, tokenizer: Any) -> list[float]:
+    """Score user messages with Qwen3-Reranker (probability of "yes").
+
+    Messages are scored in padded batches from length_batches(), one forward
+    pass each, so little of a batch is padding. Only the user message is
+    tokenized per document; the chat template around it was tokenized at load,
+    and truncation only shortens the user message.
+    """
+    # Tokenize, leaving room for the template
+    max_user_length = MAX_LENGTH - len(_prompt_prefix_ids) - len(_prompt_suffix_ids)
+    encoded = tokenizer(
+        users,
+        add_special_tokens=False,
+        truncation=True,
+        max_length=max_user_length,
+    )["input_ids"]
+    input_ids = [_prompt_prefix_ids + ids + _prompt_suffix_ids for ids in encoded]
+
+    # Probabilities stay on the device until every batch has been queued, so
+    # there is one device-to-host copy per call instead of one per batch
+    order: list[int] = []
+    batch_probs = []
+    for rows in length_batches([len(ids) for ids in input_ids]):
+        inputs = tokenizer.pad(
+            {"input_ids": [input_ids[i] for i in rows]},
+            padding=True,
+            pad_to_multiple_of=PAD_TO_MULTIPLE_OF,
+            return_tensors="pt",
+        ).to(model.device)
+
+        # Get the [yes, no] logits at each prompt's last position; the
+        # two-row LM head runs only there
+        with torch.inference_mode():
+            logits = model(**inputs, logits_to_keep=1).logits[:, -1, :]
+
+        # Compute probability of "yes"
+        probs = torch.softmax(logits.float(), dim=-1)
+        batch_probs.append(probs[:, 0])
+        order.extend(rows)
+
+    scores = [0.0] * len(input_ids)
+    for i, score in zip(order, torch.cat(batch_probs).tolist(), strict=True):
+        scores[i] = score
+    return scores
+
+
+class ScoreCache:
+    """LRU cache of document scores, so repeated pairs skip the model.
+
+    Keys hash the instruction, query and document together, keeping memory
+    per entry small and fixed however long the document is.
+    """
+
+    def __init__(self, max_entries: int = SCORE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(instruction: str | None, query: str, document: str) -> bytes:
+        """Hash a scored triple; NUL separators keep the fields apart."""
+        h = hashlib.blake2b(digest_size=16)
+        for part in (instruction or "", query, document):
+            h.update(part.encode())
+            h.update(b"\0")
+        return h.digest()
+
+    def get(self, key: bytes) -> float | None:
+        """Get a cached score, counting the hit or miss."""
+        score = self._entries.get(key)
+        if score is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return score
+
+    def put(self, key: bytes, score: float) -> None:
+        """Cache a score, evicting the least recently used beyond max_entries."""
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = score
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+_score_cache = ScoreCache()
+
+
+def warm_up(model: Any, tokenizer: Any) -> None:
+    """Run the Qwen forward pass before serving.
+
+    A compiled model's reduce-overhead mode captures a CUDA graph per input
+    shape, replaying a whole forward pass as one launch afterwards. Each
+    common batch shape within BATCH_SIZE and MAX_BATCH_TOKENS is run here, so
+    those graphs are captured before the first request rather than during it.
+    """
+    if not _compiled:
+        rerank_with_qwen("warm up", ["warm up"], None, model, tokenizer)
+        return
+
+    for length in WARMUP_LENGTHS:
+        for rows in WARMUP_BATCH_SIZES:
+            if rows > BATCH_SIZE or rows * length > MAX_BATCH_TOKENS:
+                continue
+            inputs = tokenizer.pad(
+                {"input_ids": [[tokenizer.pad_token_id] * length] * rows},
+                return_tensors="pt",
+            ).to(model.device)
+            with torch.inference_mode():
+                for _ in range(WARMUP_RUNS):
+                    model(**inputs, logits_to_keep=1)
+    torch.cuda.synchronize()
+
+
+def rank(scores: list[float]) -> list[RerankResult]:
+    """Build results sorted by score descending."""
+    results = [RerankResult(index=idx, score=score) for idx, score in enumerate(scores)]
+    results.sort(key=lambda r: r.score, reverse=True)
+    return results
+
+
 def rerank_with_qwen(
     query: str,
     documents: list[str],
@@ -83,61 +350,69 @@ def rerank_with_qwen(
     tokenizer: Any,
 ) -> list[RerankResult]:
     """Rerank using Qwen3-Reranker (LM-style yes/no scoring)."""
-    results = []
-
-    # System prompt for Qwen reranker
-    system = (
-        "Judge whether the Document meets the requirements based on the Query "
-        "and the Instruct provided. Note that the answer can only be 'yes' or 'no'."
-    )
-
-    for idx, doc in enumerate(documents):
-        # Build prompt
-        if instruction:
-            user = f"<Instruct>: {instruction}\n\n<Query>: {query}\n\n<Document>: {doc}"
-        else:
-            user = f"<Query>: {query}\n\n<Document>: {doc}"
-
-        messages = [
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ]
+    users = qwen_user_messages(query, documents, instruction)
+    return rank(score_with_qwen(users, model, tokenizer))
 
-        # Tokenize
-        inputs = tokenizer.apply_chat_template(
-            messages,
-            tokenize=True,
-            add_generation_prompt=True,
-            return_tensors="pt",
-        ).to(model.device)
 
-        # Get logits for yes/no tokens
-        with torch.no_grad():
-            outputs = model(inputs)
-            logits = outputs.logits[:, -1, :]
+class QwenBatcher:
+    """Coalesces concurrent Qwen rerank requests into shared forward passes.
 
-        # Get yes/no token IDs
-        yes_id = tokenizer.encode("yes", add_special_tokens=False)[0]
-        no_id = tokenizer.encode("no", add_special_tokens=False)[0]
+    Requests are scored as soon as the model is free. Requests that arrive
+    while a batch is being scored are scored together next, up to BATCH_SIZE
+    documents (a larger request is scored on its own).
+    """
 
-        # Compute probability of "yes"
-        probs = torch.softmax(logits[:, [yes_id, no_id]], dim=-1)
-        yes_prob = probs[0, 0].item()
+    def __init__(self) -> None:
+        self._pending: list[tuple[list[str], asyncio.Future[list[float]]]] = []
+        self._sender: asyncio.Task[None] | None = None
 
-        results.append(RerankResult(index=idx, score=yes_prob))
+    async def score(self, users: list[str]) -> list[float]:
+        """Score user messages, sharing forward passes with other requests."""
+        future: asyncio.Future[list[float]] = asyncio.get_running_loop().create_future()
+        self._pending.append((users, future))
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.create_task(self._score_pending())
+        return await future
 
-    # Sort by score descending
-    results.sort(key=lambda r: r.score, reverse=True)
-    return results
-
-
-def rerank_with_zerank(
+    async def _score_pending(self) -> None:
+        model, tokenizer = get_model()
+        while self._pending:
+            count = 1
+            size = len(self._pending[0][0])
+            while count < len(self._pending) and size + len(self._pending[count][0]) <= BATCH_SIZE:
+                size += len(self._pending[count][0])
+                count += 1
+            batch, self._pending = self._pending[:count], self._pending[count:]
+
+            # Score on the scoring thread so requests keep arriving meanwhile
+            users = [user for request_users, _ in batch for user in request_users]
+            try:
+                scores = await asyncio.get_running_loop().run_in_executor(
+                    _scoring_thread, score_with_qwen, users, model, tokenizer
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for request_users, future in batch:
+                if not future.done():
+                    future.set_result(scores[offset : offset + len(request_users)])
+                offset += len(request_users)
+
+
+_qwen_batcher = QwenBatcher()
+
+
+def score_with_zerank(
     query: str,
     documents: list[str],
     instruction: str | None,
     model: Any,
-) -> list[RerankResult]:
-    """Rerank using zerank-2 (cross-encoder)."""
+) -> list[float]:
+    """Score documents with zerank-2 (cross-encoder)."""
     # Prepend instruction to query if provided
     effective_query = f"{instruction}: {query}" if instruction else query
 
@@ -147,57 +422,103 @@ def rerank_with_zerank(
     # Get scores
     scores = model.predict(pairs)
 
-    # Build results
-    results = [RerankResult(index=i, score=float(s)) for i, s in enumerate(scores)]
-
-    # Sort by score descending
-    results.sort(key=lambda r: r.score, reverse=True)
-    return results
+    return [float(s) for s in scores]
 
 
-@app.post("/rerank", response_model=RerankResponse)
-async def rerank(request: RerankRequest) -> RerankResponse:
+def rerank_with_zerank(
+    query: str,
+    documents: list[str],
+    instruction: str | None,
+    model: Any,
+) -> list[RerankResult]:
+    """Rerank using zerank-2 (cross-encoder)."""
+    return rank(score_with_zerank(query, documents, instruction, model))
+
+
+@app.post(
+    "/rerank",
+    response_model=RerankResponse,
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/json": {"schema": RerankRequest.model_json_schema()}},
+            "required": True,
+        }
+    },
+)
+async def rerank(http_request: Request) -> ORJSONResponse:
     """Rerank documents by relevance to query."""
+    # Validate the raw body in pydantic-core, skipping FastAPI's stdlib json parse
+    try:
+        request = RerankRequest.model_validate_json(await http_request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False)) from e
+
     if not request.documents:
-        return RerankResponse(results=[])
+        return ORJSONResponse({"results": []})
 
     try:
         model, tokenizer = get_model()
 
-        if tokenizer is None:
-            # zerank-2
-            results = rerank_with_zerank(
-                query=request.query,
-                documents=request.documents,
-                instruction=request.instruction,
-                model=model,
-            )
-        else:
-            # Qwen3-Reranker
-            results = rerank_with_qwen(
-                query=request.query,
-                documents=request.documents,
-                instruction=request.instruction,
-                model=model,
-                tokenizer=tokenizer,
-            )
-
-        return RerankResponse(results=results)
+        # Only documents without a cached score go through the model
+        keys = [
+            ScoreCache.key(request.instruction, request.query, doc) for doc in request.documents
+        ]
+        scores = [_score_cache.get(key) for key in keys]
+        misses = [i for i, score in enumerate(scores) if score is None]
+
+        if misses:
+            documents = [request.documents[i] for i in misses]
+            if tokenizer is None:
+                # zerank-2
+                fresh = await asyncio.get_running_loop().run_in_executor(
+                    _scoring_thread,
+                    partial(
+                        score_with_zerank,
+                        query=request.query,
+                        documents=documents,
+                        instruction=request.instruction,
+                        model=model,
+                    ),
+                )
+            else:
+                # Qwen3-Reranker, batched with concurrent requests
+                users = qwen_user_messages(request.query, documents, request.instruction)
+                fresh = await _qwen_batcher.score(users)
+
+            for i, score in zip(misses, fresh, strict=True):
+                scores[i] = score
+                _score_cache.put(keys[i], score)
+
+        results = rank(scores)
+        return ORJSONResponse({"results": [r.model_dump() for r in results]})
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/health")
-async def health() -> dict[str, str]:
+async def health() -> dict[str, Any]:
     """Health check."""
-    return {"status": "ok", "model": MODEL_ID}
+    return {
+        "status": "ok",
+        "model": MODEL_ID,
+        "score_cache": {
+            "entries": len(_score_cache),
+            "hits": _score_cache.hits,
+            "misses": _score_cache.misses,
+            "hit_rate": round(_score_cache.hit_rate, 4),
+        },
+    }
 
 
 if __name__ == "__main__":
     # Load model on startup
     print(f"Loading model: {MODEL_ID}")
-    get_model()
+    model, tokenizer = get_model()
+    if tokenizer is not None:
+        # Compile (and capture CUDA graphs) before the first request arrives,
+        # on the thread that will score requests
+        _scoring_thread.submit(warm_up, model, tokenizer).result()
     print(f"Model loaded, starting server on {HOST}:{PORT}...")
 
     uvicorn.run(app, host=HOST, port=PORT)
@@ -64,7 +64,7 @@ settings:
     return tmp_path
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_python_code() -> str:
     """Sample Python code for chunking tests."""
     return '''"""Sample module."""
@@ -99,7 +99,7 @@ class SimpleClass:
 '''
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_markdown() -> str:
     """Sample markdown for chunking tests."""
     return """# Main Title
@@ -4,8 +4,18 @@ from __future__ import annotations
 
 from pathlib import Path
 
+import pytest
+
 from probe.chunking import chunk_file, detect_kind, detect_language
+from probe.chunking.lines import LineIndex, window_starts
 from probe.chunking.text import chunk_lines, chunk_markdown
+from probe.chunking.tree_sitter import (
+    TreeCache,
+    _get_parser,
+    _kind_ids,
+    chunk_with_tree_sitter,
+    walk_semantic,
+)
 from probe.types import ChunkKind
 
 
@@ -33,6 +43,59 @@ class TestDetection:
         assert detect_kind(Path("Dockerfile")) == ChunkKind.CONFIG
 
 
+class TestLineIndex:
+    """Tests for LineIndex slicing."""
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "",
+            "one line",
+            "a\nb\nc",
+            "a\nb\nc\n",
+            "a\n\n\nb\n\n",
+            "crlf\r\nlines\r\n",
+            "mixed\rbreaks\x0cand\u2028more",
+        ],
+    )
+    def test_slice_matches_join(self, text: str) -> None:
+        lines = text.splitlines()
+        index = LineIndex(text)
+
+        assert index.count == len(lines)
+        for i in range(len(lines) + 1):
+            for j in range(i, len(lines) + 2):
+                assert index.slice(i, j) == "\n".join(lines[i:j])
+
+    @pytest.mark.parametrize(
+        "text",
+        ["", "#", "# a\n## b\n", "text\n#x\n\n# y\nz #\n#", "a\r#b\n#c\x0c#d"],
+    )
+    def test_lines_starting_with(self, text: str) -> None:
+        expected = [i for i, line in enumerate(text.splitlines()) if line.startswith("#")]
+
+        assert list(LineIndex(text).lines_starting_with("#")) == expected
+
+    def test_line_of(self) -> None:
+        index = LineIndex("ab\ncd\n")
+        assert index.line_of(0) == 0
+        assert index.line_of(2) == 0
+        assert index.line_of(3) == 1
+
+
+class TestWindowStarts:
+    """Tests for window_starts."""
+
+    def test_windows_cover_file(self) -> None:
+        assert list(window_starts(0, 150, 30)) == []
+        assert list(window_starts(10, 150, 30)) == [0]
+        assert list(window_starts(200, 50, 10)) == [0, 40, 80, 120, 160]
+
+    def test_overlap_not_smaller_than_size(self) -> None:
+        # Previously an infinite loop in chunk_lines
+        assert list(window_starts(5, 2, 2)) == [0, 1, 2, 3]
+
+
 class TestMarkdownChunking:
     """Tests for markdown chunking."""
 
@@ -98,9 +161,125 @@ class TestChunkFile:
             assert chunk.kind == ChunkKind.CODE
             assert chunk.language == "python"
 
+    def test_small_file_single_chunk(self, sample_python_code: str) -> None:
+        chunks = chunk_file(sample_python_code, Path("sample.py"))
+
+        assert len(chunks) == 1
+        assert chunks[0].content == sample_python_code.removesuffix("\n")
+        assert chunks[0].language == "python"
+
+    def test_nested_units_not_duplicated(self, sample_python_code: str) -> None:
+        chunks = chunk_with_tree_sitter(sample_python_code, Path("sample.py"), "python")
+        symbols = [c.symbol for c in chunks]
+
+        # The class covers its methods, so they aren't chunked again
+        assert "SimpleClass" in symbols
+        assert "get_value" not in symbols
+        for outer in chunks:
+            for inner in chunks:
+                if inner is not outer and outer.symbol != "(header)":
+                    assert not (
+                        outer.start_line <= inner.start_line
+                        and inner.end_line <= outer.end_line
+                    )
+
+    def test_split_unit_drops_contained_methods(self) -> None:
+        methods = "".join(f"    def m{i}(self):\n" + "        pass\n" * 10 for i in range(40))
+        content = "import os\n\n\nclass Big:\n" + methods
+
+        chunks = chunk_with_tree_sitter(content, Path("big.py"), "python")
+        ranges = [(c.start_line, c.end_line) for c in chunks]
+
+        assert [c.symbol for c in chunks] == ["(header)", "Big[part]", "Big[part]", "Big[part]"]
+        assert ranges == sorted(ranges)
+
     def test_chunk_markdown_file(self, sample_markdown: str) -> None:
         chunks = chunk_file(sample_markdown, Path("README.md"))
 
         assert len(chunks) > 0
         for chunk in chunks:
             assert chunk.kind == ChunkKind.DOC
+
+    def test_chunk_bytes_matches_text(self, sample_python_code: str) -> None:
+        from_text = chunk_file(sample_python_code, Path("sample.py"))
+        from_bytes = chunk_file(sample_python_code.encode(), Path("sample.py"))
+        from_crlf = chunk_file(
+            sample_python_code.replace("\n", "\r\n").encode(), Path("sample.py")
+        )
+
+        assert from_bytes == from_text
+        assert from_crlf == from_text
+
+    def test_chunk_binary_bytes_raises(self) -> None:
+        with pytest.raises(UnicodeDecodeError):
+            chunk_file(b"\xff\xfe\x00binary", Path("blob.py"))
+
+
+class TestTreeSitter:
+    """Tests for tree-sitter chunking internals."""
+
+    def test_parser_cached_per_language(self) -> None:
+        assert _get_parser("python") is _get_parser("python")
+
+    def test_unknown_language_returns_none(self) -> None:
+        assert _get_parser("not-a-language") is None
+
+    def test_walk_semantic_preorder(self, sample_python_code: str) -> None:
+        parser = _get_parser("python")
+        tree = parser.parse(sample_python_code.encode())
+
+        kind_ids = _kind_ids(
+            parser.language, frozenset({"function_definition", "class_definition"})
+        )
+        nodes = list(walk_semantic(tree.root_node, kind_ids))
+        names = [n.child_by_field_name("name").text.decode() for n in nodes]
+
+        assert names == [
+            "simple_function",
+            "function_with_args",
+            "SimpleClass",
+            "__init__",
+            "get_value",
+            "set_value",
+        ]
+
+    @pytest.mark.parametrize(
+        ("source", "language", "symbols"),
+        [
+            ("@cached\ndef f():\n    pass\n", "python", ["f"]),
+            ("const h = (a) => a;\nclass C { m() {} }\n", "javascript", ["h", "C"]),
+            ("int main(void) { return 0; }\n", "c", ["main"]),
+            ("impl Display for Point {}\n", "rust", ["Point"]),
+        ],
+    )
+    def test_symbol_names(self, source: str, language: str, symbols: list[str]) -> None:
+        chunks = chunk_with_tree_sitter(source, Path("sample"), language)
+
+        assert [c.symbol for c in chunks] == symbols
+
+    def test_incremental_reparse_matches_full_parse(self, sample_python_code: str) -> None:
+        path = Path("sample.py")
+        cache = TreeCache()
+        edits = [
+            sample_python_code,
+            sample_python_code.replace("return 42", "return 'héllo wörld'"),
+            sample_python_code + "\n\ndef appended():\n    pass\n",
+            sample_python_code.replace("class SimpleClass:", "class Renamed(Base):"),
+            sample_python_code[: len(sample_python_code) // 2],
+            "",
+            sample_python_code,
+        ]
+
+        for version in edits:
+            incremental = chunk_with_tree_sitter(version, path, "python", tree_cache=cache)
+            assert incremental == chunk_with_tree_sitter(version, path, "python")
+
+        assert len(cache) == 1
+
+    def test_tree_cache_evicts_oldest(self) -> None:
+        parser = _get_parser("python")
+        cache = TreeCache(max_entries=2)
+        for name in ("a.py", "b.py", "c.py"):
+            cache.parse(parser, Path(name), b"x = 1\n")
+
+        assert len(cache) == 2
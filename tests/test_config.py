@@ -8,9 +8,11 @@ import pytest
 
 from probe.config import (
     ProbeConfig,
+    get_repo_id,
     get_workspace_id,
     init_workspace,
     load_workspace_config,
+    save_workspace_config,
 )
 
 
@@ -63,6 +65,20 @@ class TestWorkspaceConfig:
         assert loaded.workspace_id == original.workspace_id
         assert loaded.preset == original.preset
 
+    def test_load_reuses_parsed_config(self, tmp_path: Path) -> None:
+        config = init_workspace(tmp_path)
+
+        first = load_workspace_config(tmp_path)
+        assert load_workspace_config(tmp_path) is first
+
+        # Rewriting the file is picked up on the next load
+        save_workspace_config(tmp_path, config.model_copy(update={"preset": "balanced"}))
+        reloaded = load_workspace_config(tmp_path)
+
+        assert reloaded is not first
+        assert reloaded is not None
+        assert reloaded.preset == "balanced"
+
     def test_load_nonexistent(self, tmp_path: Path) -> None:
         config = load_workspace_config(tmp_path)
         assert config is None
@@ -81,3 +97,23 @@ class TestWorkspaceConfig:
         # Second init should detect existing config
         existing = load_workspace_config(tmp_path)
         assert existing is not None
+
+
+class TestRepoId:
+    """Tests for get_repo_id."""
+
+    def test_reads_origin_from_git_config(self, tmp_path: Path) -> None:
+        (tmp_path / ".git").mkdir()
+        (tmp_path / ".git" / "config").write_text(
+            '[core]\n\tbare = false\n'
+            '[remote "origin"]\n\turl = git@example.com:team/repo.git\n'
+            "\tfetch = +refs/heads/*:refs/remotes/origin/*\n"
+        )
+
+        assert get_repo_id(tmp_path) == "git@example.com:team/repo.git"
+
+    def test_falls_back_to_directory_name(self, tmp_path: Path) -> None:
+        project = tmp_path / "my-project"
+        project.mkdir()
+
+        assert get_repo_id(project) == "my-project"
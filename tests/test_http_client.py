@@ -0,0 +1,36 @@
+"""Tests for the shared HTTP client."""
+
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from probe.http_client import close_http_client, get_http_client
+
+
+class TestHttpClient:
+    """Tests for get_http_client."""
+
+    @pytest.mark.asyncio
+    async def test_reused_within_loop(self) -> None:
+        client = get_http_client()
+
+        assert isinstance(client, httpx.AsyncClient)
+        assert get_http_client() is client
+
+        await close_http_client()
+        assert client.is_closed
+        assert get_http_client() is not client
+        await close_http_client()
+
+    def test_separate_client_per_loop(self) -> None:
+        async def open_client() -> httpx.AsyncClient:
+            return get_http_client()
+
+        first = asyncio.run(open_client())
+        second = asyncio.run(open_client())
+
+        # A client's pooled connections belong to the loop that created it
+        assert first is not second
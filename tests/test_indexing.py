@@ -0,0 +1,409 @@
+"""Tests for indexing module."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from collections.abc import AsyncGenerator
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+import pytest
+
+from probe import indexing
+from probe.config import ProbeConfig
+from probe.storage.manifest import Manifest
+
+
+class FakeQdrant:
+    """In-memory stand-in for QdrantClient that records upserted points."""
+
+    def __init__(self) -> None:
+        self.points: dict[str, dict[str, Any]] = {}
+        self.upsert_requests = 0
+
+    async def delete_by_file(self, workspace_id: Any, file_path: Path) -> None:
+        self.points = {
+            pid: p for pid, p in self.points.items() if p["file_path"] != str(file_path)
+        }
+
+    async def delete_workspace(self, workspace_id: Any) -> None:
+        self.points = {}
+
+    def build_point(self, **kwargs: Any) -> dict[str, Any]:
+        return {
+            "id": str(kwargs["point_id"]),
+            "file_path": str(kwargs["file_path"]),
+            "vector": kwargs["dense_vector"],
+        }
+
+    async def upsert_points(self, points: list[dict[str, Any]]) -> None:
+        self.upsert_requests += 1
+        for point in points:
+            self.points[point["id"]] = point
+
+    async def get_dense_vectors(self, point_ids: list[str]) -> dict[str, list[float]]:
+        return {pid: self.points[pid]["vector"] for pid in point_ids if pid in self.points}
+
+
+@pytest.fixture
+async def manifest(tmp_path: Path) -> AsyncGenerator[Manifest, None]:
+    """Create a manifest in the project's .probe directory (excluded from scans)."""
+    (tmp_path / ".probe").mkdir()
+    m = Manifest(tmp_path / ".probe" / "manifest.sqlite")
+    await m.connect()
+    yield m
+    await m.close()
+
+
+@pytest.fixture(autouse=True)
+def fake_embeddings(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Replace the TEI call with fixed-size zero vectors."""
+
+    async def embed_texts(texts: list[str], config: ProbeConfig) -> list[list[float]]:
+        return [[0.0] * 4 for _ in texts]
+
+    monkeypatch.setattr(indexing, "embed_texts", embed_texts)
+
+
+class TestEmbeddingBatcher:
+    """Tests for EmbeddingBatcher."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_requests(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        requests: list[list[str]] = []
+
+        async def embed_texts(texts: list[str], config: ProbeConfig) -> list[list[float]]:
+            requests.append(texts)
+            return [[float(t)] for t in texts]
+
+        monkeypatch.setattr(indexing, "embed_texts", embed_texts)
+        batcher = indexing.EmbeddingBatcher(ProbeConfig(), batch_size=4)
+
+        results = await asyncio.gather(
+            batcher.embed(["1", "2"]), batcher.embed(["3"]), batcher.embed(["4", "5"])
+        )
+
+        assert results == [[[1.0], [2.0]], [[3.0]], [[4.0], [5.0]]]
+        assert requests == [["1", "2", "3"], ["4", "5"]]
+
+    @pytest.mark.asyncio
+    async def test_failure_reaches_every_caller(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        async def embed_texts(texts: list[str], config: ProbeConfig) -> list[list[float]]:
+            raise RuntimeError("TEI down")
+
+        monkeypatch.setattr(indexing, "embed_texts", embed_texts)
+        batcher = indexing.EmbeddingBatcher(ProbeConfig())
+
+        results = await asyncio.gather(
+            batcher.embed(["a"]), batcher.embed(["b"]), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+
+class TestWalkFiles:
+    """Tests for walk_files."""
+
+    def test_prunes_ignored_directories(self, tmp_path: Path) -> None:
+        for name in (
+            "src/a.py",
+            "src/deep/b.md",
+            ".env",
+            "node_modules/pkg/index.js",
+            ".git/config",
+            "probe.egg-info/PKG-INFO",
+            "src/__pycache__/a.cpython-312.pyc",
+            "src/c.pyc",
+        ):
+            (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / name).write_text("x")
+        (tmp_path / "dangling").symlink_to(tmp_path / "missing")
+
+        found = {p.relative_to(tmp_path).as_posix() for p in indexing.walk_files(tmp_path)}
+
+        assert found == {"src/a.py", "src/deep/b.md", ".env"}
+
+    @pytest.mark.asyncio
+    async def test_scan_files_yields_stats(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        for i in range(5):
+            (tmp_path / f"{i}.py").write_text("x" * i)
+        monkeypatch.setattr(indexing, "SCAN_STAT_BATCH", 2)
+
+        found = {p.name: st.st_size async for p, st in indexing.scan_files(tmp_path)}
+
+        assert found == {f"{i}.py": i for i in range(5)}
+
+
+class TestRunScan:
+    """Tests for run_scan."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("workers", [1, 2])
+    async def test_scan_indexes_project(
+        self, temp_project: Path, manifest: Manifest, workers: int
+    ) -> None:
+        qdrant = FakeQdrant()
+
+        stats = await indexing.run_scan(
+            project_root=temp_project,
+            repo_id="repo",
+            workspace_id=uuid4(),
+            config=ProbeConfig(),
+            qdrant=qdrant,  # type: ignore[arg-type]
+            manifest=manifest,
+            workers=workers,
+        )
+
+        assert stats["files_scanned"] == 3
+        assert stats["chunks_indexed"] == len(qdrant.points) > 0
+        assert (await manifest.get_stats())["files_indexed"] == 3
+
+    @pytest.mark.asyncio
+    async def test_rescan_skips_unchanged(self, temp_project: Path, manifest: Manifest) -> None:
+        qdrant = FakeQdrant()
+        kwargs: dict[str, Any] = {
+            "project_root": temp_project,
+            "repo_id": "repo",
+            "workspace_id": uuid4(),
+            "config": ProbeConfig(),
+            "qdrant": qdrant,
+            "manifest": manifest,
+        }
+
+        await indexing.run_scan(**kwargs)
+        stats = await indexing.run_scan(**kwargs)
+
+        assert stats["files_scanned"] == 3
+        assert stats["chunks_indexed"] == 0
+
+    @pytest.mark.asyncio
+    async def test_old_index_format_rebuilt(self, temp_project: Path, manifest: Manifest) -> None:
+        qdrant = FakeQdrant()
+        kwargs: dict[str, Any] = {
+            "project_root": temp_project,
+            "repo_id": "repo",
+            "workspace_id": uuid4(),
+            "config": ProbeConfig(),
+            "qdrant": qdrant,
+            "manifest": manifest,
+        }
+
+        first = await indexing.run_scan(**kwargs)
+        await manifest.set_workspace_meta("index_format", "1")
+        old_points = set(qdrant.points)
+        qdrant.points["orphan"] = {"id": "orphan", "file_path": "gone.py", "vector": []}
+        stats = await indexing.run_scan(**kwargs)
+
+        assert stats["chunks_indexed"] == first["chunks_indexed"] > 0
+        # Points from the old format are dropped, not left behind as orphans
+        assert "orphan" not in qdrant.points
+        assert set(qdrant.points) == old_points
+        assert await manifest.get_workspace_meta("index_format") == indexing.INDEX_FORMAT_VERSION
+
+    @pytest.mark.asyncio
+    async def test_touched_file_not_reindexed(
+        self, temp_project: Path, manifest: Manifest, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        kwargs: dict[str, Any] = {
+            "project_root": temp_project,
+            "repo_id": "repo",
+            "workspace_id": uuid4(),
+            "config": ProbeConfig(),
+            "qdrant": FakeQdrant(),
+            "manifest": manifest,
+        }
+        await indexing.run_scan(**kwargs)
+
+        # Change mtime only; content hash matches, so nothing is re-embedded
+        main = temp_project / "main.py"
+        os.utime(main, (main.stat().st_atime, main.stat().st_mtime + 10))
+
+        async def fail_embed(*args: Any) -> None:
+            raise AssertionError("embed_texts should not run for unchanged content")
+
+        monkeypatch.setattr(indexing, "embed_texts", fail_embed)
+        stats = await indexing.run_scan(**kwargs)
+
+        assert stats["chunks_indexed"] == 0
+        existing = await manifest.get_file(Path("main.py"))
+        assert existing is not None and existing["mtime"] == main.stat().st_mtime
+
+    @pytest.mark.asyncio
+    async def test_edit_reembeds_only_changed_chunks(
+        self, tmp_path: Path, manifest: Manifest, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        path = tmp_path / "data.txt"
+        lines = [f"value {i}" for i in range(300)]
+        path.write_text("\n".join(lines))
+        embedded: list[str] = []
+
+        async def embed_texts(texts: list[str], config: ProbeConfig) -> list[list[float]]:
+            embedded.extend(texts)
+            return [[float(len(t)), 0.0, 0.0, 0.0] for t in texts]
+
+        monkeypatch.setattr(indexing, "embed_texts", embed_texts)
+        qdrant = FakeQdrant()
+        kwargs: dict[str, Any] = {
+            "project_root": tmp_path,
+            "repo_id": "repo",
+            "workspace_id": uuid4(),
+            "config": ProbeConfig(),
+            "qdrant": qdrant,
+            "manifest": manifest,
+        }
+
+        total = await indexing.index_file(path, **kwargs)
+        assert total > 1
+
+        embedded.clear()
+        lines[0] = "changed"
+        path.write_text("\n".join(lines))
+        count = await indexing.index_file(path, **kwargs)
+
+        assert count == total == len(qdrant.points)
+        assert len(embedded) == 1 and embedded[0].startswith("changed")
+        assert all(p["vector"][0] > 0 for p in qdrant.points.values())
+
+    @pytest.mark.asyncio
+    async def test_reverted_file_reuses_cached_chunks(
+        self, temp_project: Path, manifest: Manifest, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        kwargs: dict[str, Any] = {
+            "project_root": temp_project,
+            "repo_id": "repo",
+            "workspace_id": uuid4(),
+            "config": ProbeConfig(),
+            "qdrant": FakeQdrant(),
+            "manifest": manifest,
+            "workers": 1,
+        }
+        first = await indexing.run_scan(**kwargs)
+
+        # Edit and revert; the original content's chunks come from the cache
+        main = temp_project / "main.py"
+        original = main.read_text()
+        main.write_text(original + "\n# edit\n")
+        await indexing.run_scan(**kwargs)
+        main.write_text(original)
+
+        def fail_chunk_file(*args: Any) -> None:
+            raise AssertionError("chunk_file should not run on a cache hit")
+
+        monkeypatch.setattr(indexing, "chunk_file", fail_chunk_file)
+        second = await indexing.run_scan(**kwargs)
+
+        assert 0 < second["chunks_indexed"] < first["chunks_indexed"]
+
+    @pytest.mark.asyncio
+    async def test_binary_file_recorded_and_skipped(
+        self, temp_project: Path, manifest: Manifest, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        (temp_project / "logo.png").write_bytes(b"\x89PNG\r\n\x1a\n\x00\x00" + bytes(500))
+        kwargs: dict[str, Any] = {
+            "project_root": temp_project,
+            "repo_id": "repo",
+            "workspace_id": uuid4(),
+            "config": ProbeConfig(),
+            "qdrant": FakeQdrant(),
+            "manifest": manifest,
+        }
+        await indexing.run_scan(**kwargs)
+
+        existing = await manifest.get_file(Path("logo.png"))
+        assert existing is not None and existing["last_error"] == "binary"
+        assert (await manifest.get_stats())["files_indexed"] == 3
+
+        # The next scan skips it on mtime/size alone
+        def fail_read(path: Path) -> None:
+            raise AssertionError(f"{path} should not be read again")
+
+        monkeypatch.setattr(indexing, "read_file", fail_read)
+        await indexing.run_scan(**kwargs)
+
+    @pytest.mark.asyncio
+    async def test_large_file_skipped(
+        self, temp_project: Path, manifest: Manifest, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        qdrant = FakeQdrant()
+        kwargs: dict[str, Any] = {
+            "project_root": temp_project,
+            "repo_id": "repo",
+            "workspace_id": uuid4(),
+            "config": ProbeConfig(),
+            "qdrant": qdrant,
+            "manifest": manifest,
+        }
+        await indexing.run_scan(**kwargs)
+
+        # main.py grows past the limit: its chunks are dropped, others kept
+        monkeypatch.setattr(indexing, "MAX_FILE_BYTES", 200)
+        with (temp_project / "main.py").open("a") as f:
+            f.write("# padding\n" * 20)
+        await indexing.run_scan(**kwargs)
+
+        assert await manifest.get_file(Path("main.py")) is None
+        assert {p["file_path"] for p in qdrant.points.values()} == {"README.md", "config.yaml"}
+
+    @pytest.mark.asyncio
+    async def test_embeds_in_batches(
+        self, temp_project: Path, manifest: Manifest, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        batch_sizes: list[int] = []
+
+        async def embed_texts(texts: list[str], config: ProbeConfig) -> list[list[float]]:
+            batch_sizes.append(len(texts))
+            return [[0.0] * 4 for _ in texts]
+
+        monkeypatch.setattr(indexing, "embed_texts", embed_texts)
+        monkeypatch.setattr(indexing, "EMBED_BATCH_SIZE", 2)
+        monkeypatch.setattr(indexing, "UPSERT_BATCH_SIZE", 4)
+        (temp_project / "long.txt").write_text("".join(f"line {i}\n" for i in range(1000)))
+        qdrant = FakeQdrant()
+
+        stats = await indexing.run_scan(
+            project_root=temp_project,
+            repo_id="repo",
+            workspace_id=uuid4(),
+            config=ProbeConfig(),
+            qdrant=qdrant,  # type: ignore[arg-type]
+            manifest=manifest,
+            workers=1,
+        )
+
+        assert max(batch_sizes) == 2
+        assert sum(batch_sizes) == stats["chunks_indexed"]
+        # One request per two embedding batches, plus a partial one per file
+        assert qdrant.upsert_requests < len(batch_sizes)
+        assert len(qdrant.points) == stats["chunks_indexed"]
+
+
+class TestHashing:
+    """Tests for file hashing helpers."""
+
+    def test_read_file_matches_streamed_hash(self, tmp_path: Path) -> None:
+        path = tmp_path / "data.bin"
+        path.write_bytes(bytes(range(256)) * 1000)
+
+        data, file_hash = indexing.read_file(path)
+
+        assert data == path.read_bytes()
+        assert file_hash == indexing.compute_file_hash(path)
+
+    def test_point_id_deterministic(self) -> None:
+        workspace_id = uuid4()
+
+        point_id = indexing.compute_point_id(workspace_id, Path("a.py"), 1, 10)
+
+        assert point_id == indexing.compute_point_id(workspace_id, Path("a.py"), 1, 10)
+        assert point_id != indexing.compute_point_id(workspace_id, Path("a.py"), 1, 11)
+        assert indexing.compute_point_ids(workspace_id, Path("a.py"), [(1, 11), (1, 10)]) == [
+            indexing.compute_point_id(workspace_id, Path("a.py"), 1, 11),
+            point_id,
+        ]
+        assert len(indexing.compute_chunk_hash("x = 1")) == 16
@@ -0,0 +1,223 @@
+"""Tests for retrieval module."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+import httpx
+import pytest
+
+from probe import retrieval
+from probe.chunking import chunk_file
+from probe.config import ProbeConfig
+from probe.indexing import compute_chunk_hash
+
+
+@pytest.fixture
+def tei_requests(monkeypatch: pytest.MonkeyPatch) -> list[list[str]]:
+    """Serve TEI /embed from a mock transport, recording request inputs."""
+    requests: list[list[str]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        inputs = json.loads(request.content)["inputs"]
+        requests.append(inputs)
+        return httpx.Response(200, json=[[float(len(t))] for t in inputs])
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(retrieval, "get_http_client", lambda: client)
+    monkeypatch.setattr(retrieval, "_query_cache", type(retrieval._query_cache)())
+    return requests
+
+
+class TestEmbedQuery:
+    """Tests for embed_query."""
+
+    @pytest.mark.asyncio
+    async def test_repeated_query_cached(self, tei_requests: list[list[str]]) -> None:
+        config = ProbeConfig()
+
+        first = await retrieval.embed_query("parse config", config)
+        second = await retrieval.embed_query("parse config", config)
+
+        assert first == second
+        assert len(tei_requests) == 1
+        assert tei_requests[0][0].startswith(retrieval.QUERY_INSTRUCTION)
+
+    @pytest.mark.asyncio
+    async def test_cache_evicts_oldest(
+        self, tei_requests: list[list[str]], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(retrieval, "QUERY_CACHE_MAX_ENTRIES", 2)
+        config = ProbeConfig()
+
+        for query in ("a", "b", "a", "c", "a", "b"):
+            await retrieval.embed_query(query, config)
+
+        # "b" was least recently used when "c" arrived, so it was re-embedded
+        assert len(tei_requests) == 4
+
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_share_request(self, tei_requests: list[list[str]]) -> None:
+        config = ProbeConfig()
+
+        results = await asyncio.gather(
+            *(retrieval.embed_query(q, config) for q in ("a", "bb", "a", "ccc"))
+        )
+
+        assert results == [results[0], results[1], results[0], results[3]]
+        assert results[0] != results[1] != results[3]
+        assert tei_requests == [[retrieval.QUERY_INSTRUCTION + q for q in ("a", "bb", "ccc")]]
+
+    @pytest.mark.asyncio
+    async def test_short_response_fails_every_query(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """A response missing embeddings fails the waiting searches, not hangs them."""
+        client = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, json=[[1.0]]))
+        )
+        monkeypatch.setattr(retrieval, "get_http_client", lambda: client)
+        config = ProbeConfig()
+
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                *(retrieval.embed_query(q, config) for q in ("x1", "x2")),
+                return_exceptions=True,
+            ),
+            1,
+        )
+
+        assert all(isinstance(r, ValueError) for r in results)
+
+
+class TestGenerateSnippet:
+    """Tests for generate_snippet."""
+
+    def test_staleness_follows_file_changes(self, tmp_path: Path) -> None:
+        path = tmp_path / "a.py"
+        path.write_text("one\ntwo\nthree\n")
+        chunk_hash = hashlib.blake2b(b"two\nthree", digest_size=8).hexdigest()
+
+        snippet, stale = retrieval.generate_snippet(Path("a.py"), 2, 3, tmp_path, chunk_hash)
+        assert (snippet, stale) == ("two\nthree", False)
+
+        # Cached lines must not hide an edit
+        path.write_text("one\n2\nthree\n")
+        snippet, stale = retrieval.generate_snippet(Path("a.py"), 2, 3, tmp_path, chunk_hash)
+        assert (snippet, stale) == ("2\nthree", True)
+
+    def test_small_file_chunk_not_stale(self, tmp_path: Path) -> None:
+        """A whole-file chunk hashes the same text the snippet check reads."""
+        source = 'def hello():\n    return "héllo"\n'
+        (tmp_path / "a.py").write_text(source)
+        [chunk] = chunk_file(source.encode(), Path("a.py"))
+
+        _, stale = retrieval.generate_snippet(
+            Path("a.py"),
+            chunk.start_line,
+            chunk.end_line,
+            tmp_path,
+            compute_chunk_hash(chunk.content),
+        )
+        assert stale is False
+
+    def test_missing_file(self, tmp_path: Path) -> None:
+        _, stale = retrieval.generate_snippet(Path("gone.py"), 1, 2, tmp_path)
+
+        assert stale
+
+
+class FakeQdrant:
+    """Returns fixed hybrid search candidates."""
+
+    def __init__(self, candidates: list[dict[str, Any]]) -> None:
+        self.candidates = candidates
+        self.limits: list[int] = []
+
+    async def hybrid_search(self, **kwargs: Any) -> list[dict[str, Any]]:
+        self.limits.append(kwargs["limit"])
+        return [dict(c, signals={}) for c in self.candidates]
+
+
+class TestSearch:
+    """Tests for search."""
+
+    @pytest.mark.asyncio
+    async def test_snippets_match_candidates(
+        self, tmp_path: Path, tei_requests: list[list[str]]
+    ) -> None:
+        for name in ("a.py", "b.py"):
+            (tmp_path / name).write_text("".join(f"{name} {i}\n" for i in range(1, 11)))
+        qdrant = FakeQdrant(
+            [
+                {"file_path": "b.py", "start_line": 3, "end_line": 4, "score": 0.9},
+                {"file_path": "a.py", "start_line": 1, "end_line": 2, "score": 0.8},
+                {"file_path": "b.py", "start_line": 9, "end_line": 10, "score": 0.7},
+            ]
+        )
+
+        results = await retrieval.search(
+            query="q",
+            repo_id="repo",
+            workspace_id=uuid4(),
+            project_root=tmp_path,
+            config=ProbeConfig(),
+            qdrant=qdrant,  # type: ignore[arg-type]
+        )
+
+        assert [r.snippet for r in results] == [
+            "b.py 3\nb.py 4",
+            "a.py 1\na.py 2",
+            "b.py 9\nb.py 10",
+        ]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(("top_k", "limit"), [(5, 20), (12, 36), (50, 100), (150, 150)])
+    async def test_fusion_limit_scales_with_top_k(
+        self, tmp_path: Path, tei_requests: list[list[str]], top_k: int, limit: int
+    ) -> None:
+        qdrant = FakeQdrant([])
+
+        await retrieval.search(
+            query="q",
+            repo_id="repo",
+            workspace_id=uuid4(),
+            project_root=tmp_path,
+            config=ProbeConfig(reranker_url="http://rerank"),
+            qdrant=qdrant,  # type: ignore[arg-type]
+            top_k=top_k,
+        )
+
+        assert qdrant.limits == [limit]
+
+    @pytest.mark.asyncio
+    async def test_single_candidate_not_reranked(
+        self, tmp_path: Path, tei_requests: list[list[str]], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        (tmp_path / "a.py").write_text("a\n")
+        qdrant = FakeQdrant([{"file_path": "a.py", "start_line": 1, "end_line": 1}])
+        reranked: list[list[str]] = []
+
+        async def fake_rerank(query: str, documents: list[str], *args: Any) -> Any:
+            reranked.append(documents)
+            return [(0, 1.0)]
+
+        monkeypatch.setattr(retrieval, "rerank", fake_rerank)
+
+        results = await retrieval.search(
+            query="q",
+            repo_id="repo",
+            workspace_id=uuid4(),
+            project_root=tmp_path,
+            config=ProbeConfig(reranker_url="http://rerank"),
+            qdrant=qdrant,  # type: ignore[arg-type]
+            mode="quality",
+        )
+
+        assert [r.snippet for r in results] == ["a"]
+        assert reranked == []
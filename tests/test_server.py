@@ -2,12 +2,24 @@
 
 from __future__ import annotations
 
+import hashlib
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from pathlib import Path
 
+import httpx
 import pytest
 from mcp.types import TextContent
 
-from probe.server import handle_open_file
+from probe import server
+from probe.config import ProbeConfig
+from probe.server import (
+    check_backends,
+    get_manifest,
+    handle_open_file,
+    read_line_range,
+)
+from probe.storage import Manifest, close_manifests
 
 
 class TestOpenFile:
@@ -61,3 +73,135 @@ class TestOpenFile:
         # Should either fail with escape error or not found
         text = result[0].text.lower()
         assert "escapes" in text or "not found" in text or "error" in text
+
+    @pytest.mark.asyncio
+    async def test_open_file_sibling_prefix_rejected(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        project = tmp_path / "proj"
+        project.mkdir()
+        sibling = tmp_path / "proj-attack"
+        sibling.mkdir()
+        (sibling / "secret.txt").write_text("secret\n")
+        monkeypatch.chdir(project)
+
+        result = await handle_open_file({
+            "path": "../proj-attack/secret.txt",
+            "start_line": 1,
+            "end_line": 1,
+        })
+
+        assert "escapes" in result[0].text
+
+
+class TestReadLineRange:
+    """Tests for read_line_range."""
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "a\nb\nc\nd\n",
+            "a\nb\nc\nd",
+            "a\r\nb\r\nc\r\nd\r\n",
+            "a\nb\rc\nd\n",
+            "a\r\nb\r\r\nc\n",
+            "a\nb\u2028c\nd",
+            "",
+        ],
+    )
+    def test_matches_splitlines(self, tmp_path: Path, text: str) -> None:
+        path = tmp_path / "file.txt"
+        path.write_bytes(text.encode())
+        lines = text.splitlines()
+
+        for start, end in [(1, 1), (2, 3), (3, 10), (5, 6), (0, 2), (3, 2), (1, 0), (0, 0)]:
+            selected, file_hash = read_line_range(path, start, end)
+
+            assert selected == lines[max(0, start - 1):end]
+            assert file_hash == hashlib.sha256(text.encode()).hexdigest()
+
+
+class TestManifestConnection:
+    """Tests for the server's manifest connection."""
+
+    @pytest.mark.asyncio
+    async def test_opened_once_index_exists(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        manifest_path = tmp_path / "manifest.sqlite"
+        monkeypatch.setattr(server, "_manifest_path", manifest_path)
+
+        # No index yet: nothing to open
+        assert await get_manifest() is None
+
+        created = Manifest(manifest_path)
+        await created.connect()
+        await created.close()
+
+        manifest = await get_manifest()
+        assert manifest is not None
+        assert await get_manifest() is manifest
+        assert await manifest.get_stats() == {"files_indexed": 0, "chunks_indexed": 0}
+
+        await close_manifests()
+        assert manifest._conn is None
+
+    @pytest.mark.asyncio
+    async def test_unreadable_manifest_does_not_stop_startup(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """A manifest that can't be opened is left for tool calls to retry."""
+        # run_server sets the project root globals; restore them afterwards
+        for name in ("_project_root", "_resolved_root", "_manifest_path"):
+            monkeypatch.setattr(server, name, getattr(server, name))
+        (tmp_path / ".probe").mkdir()
+        (tmp_path / ".probe" / "manifest.sqlite").write_bytes(b"not a database" * 512)
+
+        @asynccontextmanager
+        async def fake_stdio_server() -> AsyncIterator[tuple[None, None]]:
+            yield None, None
+
+        served: list[bool] = []
+
+        async def fake_run(*args: object) -> None:
+            served.append(True)
+
+        monkeypatch.setattr(server, "stdio_server", fake_stdio_server)
+        monkeypatch.setattr(server.server, "run", fake_run)
+
+        await server.run_server(tmp_path)
+
+        assert served == [True]
+
+
+class TestCheckBackends:
+    """Tests for backend health checks."""
+
+    @pytest.mark.asyncio
+    async def test_checks_cached(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        requests: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(str(request.url))
+            return httpx.Response(200 if request.url.host == "tei" else 503)
+
+        class FakeQdrant:
+            def __init__(self, url: str, preset: str) -> None:
+                pass
+
+            async def health_check(self) -> bool:
+                return True
+
+            async def close(self) -> None:
+                pass
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(server, "get_http_client", lambda: client)
+        monkeypatch.setattr(server, "QdrantClient", FakeQdrant)
+        monkeypatch.setattr(server, "_health_cache", {})
+        config = ProbeConfig(tei_url="http://tei", reranker_url="http://rerank")
+
+        assert await check_backends(config, "lite") == (True, True, False)
+        assert await check_backends(config, "lite") == (True, True, False)
+        assert requests == ["http://tei/health", "http://rerank/health"]
+        await client.aclose()
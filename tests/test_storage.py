@@ -2,14 +2,25 @@
 
 from __future__ import annotations
 
+import asyncio
+import sqlite3
 from collections.abc import AsyncGenerator
 from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
 from uuid import uuid4
 
 import pytest
 
-from probe.storage.manifest import Manifest
-from probe.types import ChunkKind, IndexedChunk
+from probe.storage import qdrant as qdrant_module
+from probe.storage.manifest import (
+    READ_CONNECTIONS,
+    Manifest,
+    close_manifests,
+    open_manifest,
+)
+from probe.storage.qdrant import QdrantClient, glob_literal
+from probe.types import Chunk, ChunkKind, IndexedChunk
 
 
 @pytest.fixture
@@ -109,6 +120,35 @@ class TestManifest:
         neighbors = await manifest.get_neighbor_chunks(file_path, 1)
         assert len(neighbors) == 1  # Only chunk_idx=0 exists as neighbor
 
+        # Deleting the file cascades to its chunks
+        await manifest.delete_file(file_path)
+        assert await manifest.get_chunk_points(file_path) == {}
+
+    @pytest.mark.asyncio
+    async def test_upsert_file_chunks(self, manifest: Manifest) -> None:
+        """Parallel sequences are stored like the equivalent IndexedChunks."""
+        file_path = Path("test.py")
+        await manifest.upsert_file(
+            file_path=file_path, mtime=1234567890.0, size=1000, file_hash="abc123"
+        )
+
+        point_ids = [uuid4(), uuid4()]
+        await manifest.upsert_file_chunks(
+            file_path,
+            start_lines=[1, 11],
+            end_lines=[10, 20],
+            chunk_hashes=["hash1", "hash2"],
+            point_ids=point_ids,
+        )
+
+        assert await manifest.get_chunk_points(file_path) == {
+            "hash1": str(point_ids[0]),
+            "hash2": str(point_ids[1]),
+        }
+        chunk = await manifest.get_chunk_by_position(file_path, 11, 20)
+        assert chunk is not None
+        assert chunk["chunk_idx"] == 1
+
     @pytest.mark.asyncio
     async def test_stats(self, manifest: Manifest) -> None:
         # Empty initially
@@ -139,3 +179,237 @@ class TestManifest:
         # Update
         await manifest.set_workspace_meta("foo", "baz")
         assert await manifest.get_workspace_meta("foo") == "baz"
+
+    @pytest.mark.asyncio
+    async def test_chunk_cache(self, manifest: Manifest) -> None:
+        chunks = [
+            Chunk(file_path=Path("a.py"), start_line=1, end_line=3, content="x = 1"),
+        ]
+
+        # Miss, then hit
+        assert await manifest.get_cached_chunks("k1") is None
+        await manifest.put_cached_chunks("k1", chunks)
+        assert await manifest.get_cached_chunks("k1") == chunks
+
+        # Pruning keeps only the newest entries
+        await manifest.put_cached_chunks("k2", [])
+        await manifest.prune_chunk_cache(max_entries=0)
+        assert await manifest.get_cached_chunks("k1") is None
+        assert await manifest.get_cached_chunks("k2") is None
+
+    @pytest.mark.asyncio
+    async def test_wal_mode(self, manifest: Manifest) -> None:
+        assert manifest._conn is not None
+        async with manifest._conn.execute("PRAGMA journal_mode") as cursor:
+            row = await cursor.fetchone()
+
+        assert row is not None and row[0] == "wal"
+
+        async with manifest._conn.execute("PRAGMA foreign_keys") as cursor:
+            row = await cursor.fetchone()
+
+        assert row is not None and row[0] == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_defers_commit(self, manifest: Manifest) -> None:
+        reader = Manifest(manifest.db_path)
+        await reader.connect()
+        try:
+            async with manifest.batch():
+                await manifest.upsert_file(Path("a.py"), mtime=1.0, size=1, file_hash="h")
+                # Not visible to other connections until the batch ends
+                assert await reader.get_file(Path("a.py")) is None
+
+            assert await reader.get_file(Path("a.py")) is not None
+        finally:
+            await reader.close()
+
+    @pytest.mark.asyncio
+    async def test_lookups_use_read_connections(self, manifest: Manifest) -> None:
+        async with manifest.batch():
+            await manifest.upsert_file(Path("a.py"), mtime=1.0, size=1, file_hash="h")
+
+            # The writer sees its own pending write; readers see committed state
+            assert await manifest.get_file(Path("a.py")) is not None
+            stats = await asyncio.gather(*(manifest.get_stats() for _ in range(10)))
+            assert all(s["files_indexed"] == 0 for s in stats)
+            assert len(manifest._readers) <= READ_CONNECTIONS
+
+        assert (await manifest.get_stats())["files_indexed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_rowid_tables_migrated(self, tmp_path: Path) -> None:
+        db_path = tmp_path / "old.sqlite"
+        with sqlite3.connect(db_path) as conn:
+            conn.executescript(
+                """
+                CREATE TABLE chunks (
+                    file_path TEXT NOT NULL,
+                    start_line INTEGER NOT NULL,
+                    end_line INTEGER NOT NULL,
+                    chunk_hash TEXT NOT NULL,
+                    point_id TEXT NOT NULL,
+                    chunk_idx INTEGER NOT NULL,
+                    PRIMARY KEY (file_path, start_line, end_line)
+                );
+                CREATE INDEX idx_chunks_point ON chunks(point_id);
+                CREATE TABLE files (
+                    file_path TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    file_hash TEXT NOT NULL,
+                    last_indexed_at REAL NOT NULL DEFAULT (unixepoch()),
+                    last_error TEXT
+                );
+                CREATE TABLE workspace (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+                INSERT INTO files (file_path, mtime, size, file_hash) VALUES ('a.py', 1, 2, 'f');
+                INSERT INTO chunks VALUES ('a.py', 1, 10, 'h', 'p', 0);
+                INSERT INTO chunks VALUES ('gone.py', 1, 10, 'h2', 'p2', 0);
+                INSERT INTO workspace VALUES ('foo', 'bar');
+                """
+            )
+        conn.close()
+
+        manifest = Manifest(db_path)
+        await manifest.connect()
+        try:
+            assert await manifest.get_workspace_meta("foo") == "bar"
+            assert await manifest.get_chunk_points(Path("a.py")) == {"h": "p"}
+            assert (await manifest.get_stats())["chunks_indexed"] == 1
+        finally:
+            await manifest.close()
+
+        with sqlite3.connect(db_path) as conn:
+            schema = dict(conn.execute("SELECT name, sql FROM sqlite_master"))
+        conn.close()
+        assert "WITHOUT ROWID" in schema["chunks"]
+        assert "file_id" in schema["chunks"]
+        assert "WITHOUT ROWID" in schema["workspace"]
+        assert "idx_chunks_point" in schema
+
+
+class TestOpenManifest:
+    """Tests for the shared manifest registry."""
+
+    @pytest.mark.asyncio
+    async def test_shared_per_path(self, tmp_path: Path) -> None:
+        first = await open_manifest(tmp_path / "a.sqlite")
+        other = await open_manifest(tmp_path / "b.sqlite")
+
+        assert await open_manifest(tmp_path / "a.sqlite") is first
+        assert other is not first
+
+        # Closing directly drops it from the registry
+        await first.close()
+        reopened = await open_manifest(tmp_path / "a.sqlite")
+        assert reopened is not first
+
+        await close_manifests()
+        assert reopened._conn is None and other._conn is None
+
+
+class TestEnsureCollection:
+    """Tests for QdrantClient.ensure_collection."""
+
+    @pytest.mark.asyncio
+    async def test_checks_once(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        calls: list[str] = []
+
+        class FakeClient:
+            def __init__(self, url: str) -> None:
+                pass
+
+            async def collection_exists(self, collection_name: str) -> bool:
+                calls.append("exists")
+                return False
+
+            async def create_collection(self, **kwargs: Any) -> None:
+                calls.append("create")
+
+            async def create_payload_index(self, **kwargs: Any) -> None:
+                pass
+
+        monkeypatch.setattr(qdrant_module, "AsyncQdrantClient", FakeClient)
+        qdrant = QdrantClient(url="http://qdrant")
+
+        await qdrant.ensure_collection()
+        await qdrant.ensure_collection()
+
+        assert calls == ["exists", "create"]
+
+    @pytest.mark.parametrize(
+        ("preset", "expected"),
+        [("lite", "ScalarQuantization"), ("pro", "BinaryQuantization")],
+    )
+    def test_quantization_per_preset(self, preset: str, expected: str) -> None:
+        qdrant = QdrantClient.__new__(QdrantClient)
+        qdrant.quantization = qdrant_module.PRESET_CONFIG[preset]["quantization"]
+
+        assert type(qdrant._quantization_config()).__name__ == expected
+
+
+class TestGlobFilters:
+    """Tests for QdrantClient._apply_glob_filters."""
+
+    @pytest.mark.parametrize(
+        ("filters", "expected"),
+        [
+            ({"include_globs": ["src/*"]}, ["src/a.py", "src/b.ts", "src/sub/c.py"]),
+            ({"include_globs": ["*.py", "docs/*"]}, ["src/a.py", "src/sub/c.py", "docs/x.md"]),
+            ({"exclude_globs": ["*.py"]}, ["src/b.ts", "docs/x.md"]),
+            ({"include_globs": ["src/*"], "exclude_globs": ["*/sub/*"]}, ["src/a.py", "src/b.ts"]),
+        ],
+    )
+    def test_matches_fnmatch(self, filters: dict[str, list[str]], expected: list[str]) -> None:
+        paths = ["src/a.py", "src/b.ts", "src/sub/c.py", "docs/x.md"]
+        # Filtering is local; skip the constructor's connection to a server
+        qdrant = QdrantClient.__new__(QdrantClient)
+
+        results = qdrant._apply_glob_filters([{"file_path": p} for p in paths], filters)
+
+        assert [r["file_path"] for r in results] == expected
+
+    @pytest.mark.parametrize(
+        ("pattern", "literal"),
+        [
+            ("src/*", "src/"),
+            ("src/sub/**", "src/sub/"),
+            ("*.py", ".py"),
+            ("**/*.py", ".py"),
+            ("src/*.py", None),
+            ("*test*", None),
+            ("*.tar.gz", None),
+        ],
+    )
+    def test_glob_literal(self, pattern: str, literal: str | None) -> None:
+        assert glob_literal(pattern) == literal
+
+    @pytest.mark.asyncio
+    async def test_refetches_when_post_filter_leaves_too_few(self) -> None:
+        paths = [f"other/{i}.py" for i in range(40)] + [f"src/{i}.py" for i in range(10)]
+        limits: list[int] = []
+
+        class FakeClient:
+            async def query_points(self, **kwargs: Any) -> Any:
+                limits.append(kwargs["limit"])
+                points = [
+                    SimpleNamespace(id=i, score=1.0, payload={"file_path": p})
+                    for i, p in enumerate(paths[: kwargs["limit"]])
+                ]
+                return SimpleNamespace(points=points)
+
+        qdrant = QdrantClient.__new__(QdrantClient)
+        qdrant.client = FakeClient()  # type: ignore[assignment]
+        qdrant.collection_name = "chunks_lite"
+        qdrant.quantization = None
+
+        results = await qdrant.hybrid_search(
+            workspace_id=uuid4(),
+            query_vector=[0.0],
+            query_text="q",
+            limit=5,
+            filters={"include_globs": ["src/*"]},
+        )
+
+        assert [r["file_path"] for r in results] == [f"src/{i}.py" for i in range(5)]
+        assert limits == [5, 20, 80]
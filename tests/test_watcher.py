@@ -2,9 +2,15 @@
 
 from __future__ import annotations
 
+import asyncio
+import os
 from pathlib import Path
 
-from probe.watcher import WatcherState, _is_branch_switch, _should_ignore
+import pytest
+from watchfiles import Change
+
+from probe import watcher
+from probe.watcher import WatcherState, WatchFilter, _is_branch_switch, _should_ignore
 
 
 class TestShouldIgnore:
@@ -50,6 +56,12 @@ class TestShouldIgnore:
         path = tmp_path / ".hidden" / "file.txt"
         assert _should_ignore(path, tmp_path) is True
 
+    def test_ignore_egg_info_and_nested_directories(self, tmp_path: Path) -> None:
+        assert _should_ignore(tmp_path / "pkg.egg-info" / "PKG-INFO", tmp_path) is True
+        assert _should_ignore(tmp_path / "src" / "build" / "out.js", tmp_path) is True
+        assert _should_ignore(tmp_path / "src" / "builder.py", tmp_path) is False
+        assert _should_ignore(tmp_path / ".env", tmp_path) is False
+
     def test_ignore_outside_project(self, tmp_path: Path) -> None:
         path = Path("/etc/passwd")
         assert _should_ignore(path, tmp_path) is True
@@ -75,6 +87,70 @@ class TestIsBranchSwitch:
         assert _is_branch_switch(path, tmp_path) is False
 
 
+class TestWatchFilter:
+    """Tests for WatchFilter."""
+
+    def test_keeps_only_actionable_events(self, tmp_path: Path) -> None:
+        watch_filter = WatchFilter(tmp_path)
+
+        assert watch_filter(Change.modified, str(tmp_path / "main.py")) is True
+        assert watch_filter(Change.added, str(tmp_path / ".git" / "HEAD")) is True
+        assert watch_filter(Change.deleted, str(tmp_path / ".git" / "HEAD")) is True
+        assert watch_filter(Change.deleted, str(tmp_path / "main.py")) is False
+        assert watch_filter(Change.modified, str(tmp_path / "node_modules" / "a.js")) is False
+        assert watch_filter(Change.modified, str(tmp_path / ".git" / "index")) is False
+
+    def test_drops_editor_temp_files(self, tmp_path: Path) -> None:
+        watch_filter = WatchFilter(tmp_path)
+
+        for name in (".main.py.swp", "main.py~", ".#main.py", "4913"):
+            assert watch_filter(Change.added, str(tmp_path / "src" / name)) is False
+
+
+class TestStablePaths:
+    """Tests for _stable_paths."""
+
+    @pytest.mark.asyncio
+    async def test_one_wait_for_all_paths(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        paths = {tmp_path / f"{i}.py" for i in range(3)}
+        for path in paths:
+            path.write_text("x = 1")
+        changing = tmp_path / "0.py"
+        sleeps: list[float] = []
+
+        async def fake_sleep(seconds: float) -> None:
+            sleeps.append(seconds)
+            os.utime(changing, ns=(0, 0))
+
+        monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+        stable = await watcher._stable_paths(paths | {tmp_path / "missing.py"})
+
+        assert stable == paths - {changing}
+        assert sleeps == [watcher.STABLE_CHECK_SECONDS]
+
+    @pytest.mark.asyncio
+    async def test_skips_indexed_files_without_waiting(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        path = tmp_path / "a.py"
+        path.write_text("x = 1")
+        stat = path.stat()
+        sleeps: list[float] = []
+
+        async def fake_sleep(seconds: float) -> None:
+            sleeps.append(seconds)
+
+        monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+        stable = await watcher._stable_paths({path}, {path: (stat.st_mtime, stat.st_size)})
+
+        assert stable == set()
+        assert sleeps == []
+
+
 class TestWatcherState:
     """Tests for WatcherState dataclass."""
 
@@ -90,21 +166,122 @@ class TestWatcherState:
         state = WatcherState()
         state.running = True
         state.index_generation = 5
-        state.pending_paths.add(Path("test.py"))
+        state.pending_paths.add("test.py")
 
         assert state.running is True
         assert state.index_generation == 5
-        assert Path("test.py") in state.pending_paths
+        assert "test.py" in state.pending_paths
 
     def test_pending_paths_independence(self) -> None:
         # Ensure each WatcherState has its own pending_paths set
         state1 = WatcherState()
         state2 = WatcherState()
 
-        state1.pending_paths.add(Path("a.py"))
-        state2.pending_paths.add(Path("b.py"))
+        state1.pending_paths.add("a.py")
+        state2.pending_paths.add("b.py")
+
+        assert "a.py" in state1.pending_paths
+        assert "b.py" not in state1.pending_paths
+        assert "b.py" in state2.pending_paths
+        assert "a.py" not in state2.pending_paths
+
+    def test_burst_window_slides(self) -> None:
+        state = WatcherState()
+
+        assert state.record_burst(0.0, 30) == 30
+        assert state.record_burst(4.0, 15) == 45
+        # The first batch leaves the window; the second still counts
+        assert state.record_burst(6.0, 10) == 25
+        assert state.record_burst(20.0, 1) == 1
+
+
+class TestRunWatcher:
+    """Tests for run_watcher's debouncing."""
+
+    @pytest.mark.asyncio
+    async def test_leading_edge_runs_alongside_events(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Events are consumed while a leading-edge change is indexed."""
+        events: asyncio.Queue[set[tuple[Change, str]] | None] = asyncio.Queue()
+        consumed = asyncio.Event()
+        indexing = asyncio.Event()
+        release = asyncio.Event()
+        indexed: list[set[Path]] = []
+
+        async def fake_awatch(*args: object, **kwargs: object):
+            while (batch := await events.get()) is not None:
+                yield batch
+                consumed.set()
+
+        async def fake_process_changes(paths: set[Path], **kwargs: object) -> int:
+            indexed.append(paths)
+            indexing.set()
+            await release.wait()
+            return 0
+
+        monkeypatch.setattr(watcher, "awatch", fake_awatch)
+        monkeypatch.setattr(watcher, "process_changes", fake_process_changes)
+        monkeypatch.setattr(watcher, "DEBOUNCE_SECONDS", 0.01)
+
+        state = WatcherState()
+        task = asyncio.create_task(
+            watcher.run_watcher(
+                tmp_path, "repo", None, None, None, None, state  # type: ignore[arg-type]
+            )
+        )
+
+        a, b = str(tmp_path / "a.py"), str(tmp_path / "b.py")
+        await events.put({(Change.modified, a)})
+        await asyncio.wait_for(indexing.wait(), 1)
+
+        # Still indexing a.py, but the next batch is taken and left pending
+        consumed.clear()
+        await events.put({(Change.modified, b)})
+        await asyncio.wait_for(consumed.wait(), 1)
+        assert state.pending_paths == {b}
+
+        release.set()
+        await asyncio.sleep(0.05)
+        assert indexed == [{Path(a)}, {Path(b)}]
+
+        await events.put(None)
+        await asyncio.wait_for(task, 1)
+
+    @pytest.mark.asyncio
+    async def test_idle_flush_allows_next_leading_edge(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """A flush that finds nothing pending still makes way for new ones."""
+        events: asyncio.Queue[set[tuple[Change, str]] | None] = asyncio.Queue()
+        indexed: list[set[Path]] = []
+
+        async def fake_awatch(*args: object, **kwargs: object):
+            while (batch := await events.get()) is not None:
+                yield batch
+
+        async def fake_process_changes(paths: set[Path], **kwargs: object) -> int:
+            indexed.append(paths)
+            return 0
+
+        monkeypatch.setattr(watcher, "awatch", fake_awatch)
+        monkeypatch.setattr(watcher, "process_changes", fake_process_changes)
+        monkeypatch.setattr(watcher, "DEBOUNCE_SECONDS", 0.01)
+
+        state = WatcherState()
+        task = asyncio.create_task(
+            watcher.run_watcher(
+                tmp_path, "repo", None, None, None, None, state  # type: ignore[arg-type]
+            )
+        )
+
+        for name in ("a.py", "b.py"):
+            await events.put({(Change.modified, str(tmp_path / name))})
+            await asyncio.sleep(0.05)
+
+        # Both were quiet-period changes, indexed right away
+        assert indexed == [{tmp_path / "a.py"}, {tmp_path / "b.py"}]
+        assert state.pending_paths == set()
 
-        assert Path("a.py") in state1.pending_paths
-        assert Path("b.py") not in state1.pending_paths
-        assert Path("b.py") in state2.pending_paths
-        assert Path("a.py") not in state2.pending_paths
+        await events.put(None)
+        await asyncio.wait_for(task, 1)